@@ -0,0 +1,517 @@
+"""
+Local stand-in for the Supervisely API methods used by the app.
+
+Responses are generated from a synthetic dataset on request and delayed by a configurable latency,
+so the app pipeline can be benchmarked offline on datasets of any size.
+"""
+
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import supervisely as sly
+from supervisely.api.image_api import ImageApi
+from supervisely.api.labeling_job_api import LabelingJobInfo
+from supervisely.api.module_api import ApiField
+
+IMAGE_SIZES = [(1080, 1920), (3000, 4000), (480, 640)]  # height, width
+
+
+@dataclass
+class Latency:
+    """Every request takes ``request_ms`` plus ``item_ms`` for every returned or sent item."""
+
+    request_ms: float = 50
+    item_ms: float = 0.01
+
+    def wait(self, items: int = 0):
+        delay = (self.request_ms + self.item_ms * items) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SyntheticDataset:
+    """
+    Dataset of a labeling job with images, figures and image tags generated from a seed.
+    Only compact arrays are kept in memory, JSON entities are built when they are requested.
+
+    :param images_count: Number of images in the job.
+    :type images_count: int
+    :param figures_per_image: Mean number of figures on an image.
+    :type figures_per_image: float
+    :param classes_count: Number of object classes, every second class is a rectangle.
+    :type classes_count: int
+    :param tags_count: Number of image tag metas.
+    :type tags_count: int
+    :param tag_probability: Probability of every tag to be assigned to an image.
+    :type tag_probability: float
+    """
+
+    JOB_ID = 1
+    PROJECT_ID = 10
+    DATASET_ID = 100
+    WORKSPACE_ID = 1000
+    TEAM_ID = 10000
+    IMAGE_ID_OFFSET = 1_000_000
+    CLASS_ID_OFFSET = 100
+    TAG_ID_OFFSET = 200
+
+    def __init__(
+        self,
+        images_count: int,
+        figures_per_image: float = 3,
+        classes_count: int = 10,
+        tags_count: int = 5,
+        tag_probability: float = 0.2,
+        seed: int = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        self.images_count = images_count
+        self.image_ids = np.arange(images_count, dtype=np.int64) + self.IMAGE_ID_OFFSET
+        self.image_sizes = rng.integers(0, len(IMAGE_SIZES), images_count)
+        self.image_tags = rng.random((images_count, tags_count)) < tag_probability
+        figures_counts = rng.poisson(figures_per_image, images_count)
+        self.figures_offsets = np.concatenate(([0], np.cumsum(figures_counts)))
+        self.figures_count = int(self.figures_offsets[-1])
+        self.figure_image_idx = np.repeat(np.arange(images_count), figures_counts)
+        self.figure_class_idx = rng.integers(0, classes_count, self.figures_count)
+
+        obj_classes = [
+            sly.ObjClass(
+                f"class_{idx}",
+                sly.Rectangle if idx % 2 else sly.Polygon,
+                color=[int(c) for c in rng.integers(0, 256, 3)],
+                sly_id=self.CLASS_ID_OFFSET + idx,
+            )
+            for idx in range(classes_count)
+        ]
+        tag_metas = [
+            sly.TagMeta(f"tag_{idx}", sly.TagValueType.ANY_STRING, sly_id=self.TAG_ID_OFFSET + idx)
+            for idx in range(tags_count)
+        ]
+        self.project_meta = sly.ProjectMeta(obj_classes=obj_classes, tag_metas=tag_metas)
+        self._obj_classes = obj_classes
+        self._tag_metas = tag_metas
+
+    def figure_ids(self, figure_idx: np.ndarray) -> np.ndarray:
+        return figure_idx + 1
+
+    def image_json(self, idx: int) -> dict:
+        image_id = int(self.image_ids[idx])
+        height, width = IMAGE_SIZES[self.image_sizes[idx]]
+        tags = [
+            {
+                "id": image_id * 100 + tag_idx,
+                "tagId": self._tag_metas[tag_idx].sly_id,
+                "entityId": image_id,
+                "value": f"value_{tag_idx}",
+                "labelerLogin": "labeler",
+            }
+            for tag_idx in np.flatnonzero(self.image_tags[idx]).tolist()
+        ]
+        return {
+            ApiField.ID: image_id,
+            ApiField.NAME: f"image_{image_id}.jpg",
+            ApiField.HASH: f"hash_{image_id}",
+            ApiField.MIME: "image/jpeg",
+            ApiField.SIZE: 500_000,
+            ApiField.WIDTH: width,
+            ApiField.HEIGHT: height,
+            ApiField.LABELS_COUNT: int(self.figures_offsets[idx + 1] - self.figures_offsets[idx]),
+            ApiField.DATASET_ID: self.DATASET_ID,
+            ApiField.CREATED_AT: "2024-01-01T00:00:00.000Z",
+            ApiField.UPDATED_AT: "2024-01-01T00:00:00.000Z",
+            ApiField.META: {},
+            ApiField.PATH_ORIGINAL: f"/images/original/{image_id}.jpg",
+            ApiField.FULL_STORAGE_URL: f"https://example.com/images/original/{image_id}.jpg",
+            ApiField.TAGS: tags,
+        }
+
+    def figure_json(self, figure_idx: int, fields: List[str]) -> dict:
+        figure = {
+            "id": int(self.figure_ids(figure_idx)),
+            "imageId": int(self.image_ids[self.figure_image_idx[figure_idx]]),
+            "classId": self._obj_classes[self.figure_class_idx[figure_idx]].sly_id,
+        }
+        return {field: figure[field] for field in fields if field in figure}
+
+    def labels(self, idx: int) -> List[sly.Label]:
+        height, width = IMAGE_SIZES[self.image_sizes[idx]]
+        labels = []
+        idx = int(idx)
+        for figure_idx in range(self.figures_offsets[idx], self.figures_offsets[idx + 1]):
+            rng = np.random.default_rng(figure_idx)
+            obj_class = self._obj_classes[self.figure_class_idx[figure_idx]]
+            top, left = int(rng.integers(0, height // 2)), int(rng.integers(0, width // 2))
+            size = int(rng.integers(20, min(height, width) // 2))
+            if obj_class.geometry_type is sly.Rectangle:
+                geometry = sly.Rectangle(top, left, top + size, left + size)
+            else:
+                angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+                radius = size / 2 * rng.uniform(0.7, 1.0, len(angles))
+                rows = top + size / 2 + radius * np.sin(angles)
+                cols = left + size / 2 + radius * np.cos(angles)
+                geometry = sly.Polygon(
+                    [sly.PointLocation(int(r), int(c)) for r, c in zip(rows, cols)]
+                )
+            labels.append(sly.Label(geometry, obj_class))
+        return labels
+
+    def filter_images(
+        self, filters: List[dict], review_statuses: Dict[int, str] = None
+    ) -> np.ndarray:
+        """
+        Returns indices of images matching the filters.
+        Job filter drops images with review statuses out of its status list, e.g. reviewed ones.
+        """
+        mask = np.ones(self.images_count, dtype=bool)
+        tag_columns = {meta.sly_id: idx for idx, meta in enumerate(self._tag_metas)}
+        for f in filters or []:
+            data = f.get("data", {})
+            if f.get("type") == "job":
+                statuses = data.get("status")
+                if statuses and review_statuses:
+                    excluded = [i for i, s in review_statuses.items() if s not in statuses]
+                    mask &= ~np.isin(self.image_ids, excluded)
+                continue
+            if f.get("type") != "images_tag":
+                continue
+            if data.get("tagId", -1) is None and not data.get("include", True):
+                mask &= ~self.image_tags.any(axis=1)
+                continue
+            columns = [
+                tag_columns[t["tagId"]] for t in data.get("tags", []) if t["tagId"] in tag_columns
+            ]
+            if columns:
+                mask &= self.image_tags[:, columns].any(axis=1)
+        return np.flatnonzero(mask)
+
+
+FIELD_OPERATORS = {
+    "in": np.isin,
+    "=": np.equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+}
+
+
+def _image_columns(dataset: SyntheticDataset) -> Dict[str, Callable[[np.ndarray], np.ndarray]]:
+    return {"id": lambda idx: dataset.image_ids[idx]}
+
+
+def _figure_columns(dataset: SyntheticDataset) -> Dict[str, Callable[[np.ndarray], np.ndarray]]:
+    class_ids = np.array([o.sly_id for o in dataset.project_meta.obj_classes])
+    return {
+        "id": lambda idx: dataset.figure_ids(idx),
+        "entityId": lambda idx: dataset.image_ids[dataset.figure_image_idx[idx]],
+        "classId": lambda idx: class_ids[dataset.figure_class_idx[idx]],
+    }
+
+
+def _apply_field_filters(
+    columns: Dict[str, Callable[[np.ndarray], np.ndarray]], indices: np.ndarray, filters: List[dict]
+):
+    """
+    Keeps indices matching the field filters, e.g. ``{"field": "id", "operator": ">", "value": 1}``.
+    Fields the request cannot be filtered by are rejected, as the API does.
+    """
+    for f in filters or []:
+        column = columns.get(f.get(ApiField.FIELD))
+        operator = FIELD_OPERATORS.get(f.get("operator"))
+        if column is None:
+            raise ValueError(
+                f"Unknown filter field {f.get(ApiField.FIELD)!r}, expected one of {sorted(columns)}"
+            )
+        if operator is None:
+            raise NotImplementedError(
+                f"Filter operator {f.get('operator')!r} is not supported by the fake API"
+            )
+        indices = indices[operator(column(indices), f[ApiField.VALUE])]
+    return indices
+
+
+class FakeBackend:
+    """
+    Shared state of fake API instances: the dataset, latency settings and counters of calls.
+
+    :param dataset: Synthetic dataset of the job.
+    :type dataset: SyntheticDataset
+    :param latency: Latency of every request.
+    :type latency: Latency
+    :param images_page_size: Default number of images in "images.list" page.
+    :type images_page_size: int
+    :param figures_page_size: Default number of figures in "figures.list" page.
+    :type figures_page_size: int
+    """
+
+    def __init__(
+        self,
+        dataset: SyntheticDataset,
+        latency: Latency = None,
+        images_page_size: int = 500,
+        figures_page_size: int = 1000,
+    ):
+        self.dataset = dataset
+        self.latency = latency or Latency()
+        self.images_page_size = images_page_size
+        self.figures_page_size = figures_page_size
+        self.calls = Counter()
+        self.review_statuses: Dict[int, str] = {}
+        self.tag_values: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def count(self, method: str):
+        with self._lock:
+            self.calls[method] += 1
+
+    def job_info(self) -> LabelingJobInfo:
+        d = self.dataset
+        return LabelingJobInfo(
+            **{
+                **dict.fromkeys(LabelingJobInfo._fields),
+                "id": d.JOB_ID,
+                "name": "Benchmark job",
+                "team_id": d.TEAM_ID,
+                "workspace_id": d.WORKSPACE_ID,
+                "project_id": d.PROJECT_ID,
+                "dataset_id": d.DATASET_ID,
+                "status": "on_review",
+                "images_count": d.images_count,
+                "finished_images_count": d.images_count,
+                "accepted_images_count": 0,
+                "rejected_images_count": 0,
+                "progress_images_count": 0,
+                "classes_to_label": [],
+                "tags_to_label": [],
+            }
+        )
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _FakeLabelingJobApi:
+    def __init__(self, api: "FakeApi"):
+        self._api = api
+        self._backend = api.backend
+
+    def get_list(self, *args, **kwargs) -> List[LabelingJobInfo]:
+        self._backend.count("labeling_job.get_list")
+        self._backend.latency.wait(1)
+        return [self._backend.job_info()]
+
+    def get_info_by_id(self, id: int) -> LabelingJobInfo:
+        self._backend.count("labeling_job.get_info_by_id")
+        self._backend.latency.wait(1)
+        return self._backend.job_info()
+
+    def get_project_meta(self, id: int) -> sly.ProjectMeta:
+        self._backend.count("labeling_job.get_project_meta")
+        self._backend.latency.wait(1)
+        return self._backend.dataset.project_meta
+
+    def get_annotations(
+        self,
+        id: int,
+        image_ids: List[int] = None,
+        project_meta: sly.ProjectMeta = None,
+        image_infos: List[sly.ImageInfo] = None,
+    ) -> List[sly.Annotation]:
+        self._backend.count("labeling_job.get_annotations")
+        dataset = self._backend.dataset
+        if image_infos is None:
+            image_infos = self._api.image.get_list(dataset.DATASET_ID, image_ids=image_ids)
+        meta = project_meta or dataset.project_meta
+        anns = []
+        for info in image_infos:
+            idx = info.id - dataset.IMAGE_ID_OFFSET
+            img_tags = [
+                sly.Tag(meta.get_tag_meta_by_id(tag["tagId"]), tag.get("value"))
+                for tag in info.tags
+            ]
+            labels = dataset.labels(idx)
+            anns.append(sly.Annotation((info.height, info.width), labels, img_tags=img_tags))
+        self._backend.latency.wait(sum(len(ann.labels) for ann in anns))
+        return anns
+
+    def set_entity_review_status(self, id: int, entity_id: int, status: str):
+        self._api.post(
+            "jobs.entities.update-review-status",
+            {ApiField.JOB_ID: id, ApiField.ENTITY_ID: entity_id, ApiField.STATUS: status},
+        )
+
+    def set_status(self, id: int, status: str):
+        self._backend.count("labeling_job.set_status")
+        self._backend.latency.wait()
+
+
+class _FakeImageApi:
+    InfoType = ImageApi.InfoType
+    info_sequence = staticmethod(ImageApi.info_sequence)
+    _convert_json_info = ImageApi._convert_json_info
+
+    def __init__(self, api: "FakeApi"):
+        self._api = api
+        self._backend = api.backend
+
+    def get_filtered_list(self, dataset_id: int, filters: List[dict] = None) -> List[sly.ImageInfo]:
+        data = {ApiField.DATASET_ID: dataset_id, ApiField.FILTERS: filters or []}
+        response = self._api.post("images.list", data).json()
+        images = [self._convert_json_info(info) for info in response["entities"]]
+        for page in range(2, response["pagesCount"] + 1):
+            response = self._api.post("images.list", {**data, ApiField.PAGE: page}).json()
+            images.extend(self._convert_json_info(info) for info in response["entities"])
+        return images
+
+    def get_list(self, dataset_id: int, image_ids: List[int] = None) -> List[sly.ImageInfo]:
+        dataset = self._backend.dataset
+        self._backend.count("image.get_list")
+        self._backend.latency.wait(len(image_ids))
+        return [
+            self._convert_json_info(dataset.image_json(image_id - dataset.IMAGE_ID_OFFSET))
+            for image_id in image_ids
+        ]
+
+    def update_tag_value(self, tag_id: int, value) -> dict:
+        return self._api.post(
+            "image-tags.update-tag-value", {"tagId": tag_id, "value": value}
+        ).json()
+
+
+class _FakeProjectApi:
+    def __init__(self, api: "FakeApi"):
+        self._backend = api.backend
+
+    def _info(self) -> sly.ProjectInfo:
+        d = self._backend.dataset
+        return sly.ProjectInfo(
+            **{
+                **dict.fromkeys(sly.ProjectInfo._fields),
+                "id": d.PROJECT_ID,
+                "name": "Benchmark project",
+                "workspace_id": d.WORKSPACE_ID,
+                "team_id": d.TEAM_ID,
+                "images_count": d.images_count,
+                "items_count": d.images_count,
+                "type": "images",
+            }
+        )
+
+    def get_list(self, workspace_id: int, filters: List[dict] = None) -> List[sly.ProjectInfo]:
+        self._backend.count("project.get_list")
+        self._backend.latency.wait(1)
+        return [self._info()]
+
+    def get_info_by_id(self, id: int) -> sly.ProjectInfo:
+        self._backend.count("project.get_info_by_id")
+        self._backend.latency.wait(1)
+        return self._info()
+
+
+class _FakeDatasetApi:
+    def __init__(self, api: "FakeApi"):
+        self._backend = api.backend
+
+    def get_info_by_id(self, id: int) -> sly.DatasetInfo:
+        self._backend.count("dataset.get_info_by_id")
+        self._backend.latency.wait(1)
+        d = self._backend.dataset
+        return sly.DatasetInfo(
+            **{
+                **dict.fromkeys(sly.DatasetInfo._fields),
+                "id": d.DATASET_ID,
+                "name": "Benchmark dataset",
+                "project_id": d.PROJECT_ID,
+                "images_count": d.images_count,
+                "items_count": d.images_count,
+                "updated_at": "2024-01-01T00:00:00.000Z",
+                "team_id": d.TEAM_ID,
+                "workspace_id": d.WORKSPACE_ID,
+            }
+        )
+
+
+class FakeApi:
+    """
+    Fake of :class:`sly.Api` with the methods used by the app.
+    Every instance has its own headers, like the per-thread API instances of the app,
+    while the dataset and counters are shared through the backend.
+
+    :param backend: Shared state of fake API instances.
+    :type backend: FakeBackend
+    """
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.headers = {}
+        self.labeling_job = _FakeLabelingJobApi(self)
+        self.image = _FakeImageApi(self)
+        self.project = _FakeProjectApi(self)
+        self.dataset = _FakeDatasetApi(self)
+
+    def add_header(self, key: str, value: str):
+        if key in self.headers:
+            raise RuntimeError(f"Header {key!r} is already set")
+        self.headers[key] = value
+
+    def pop_header(self, key: str) -> Optional[str]:
+        return self.headers.pop(key)
+
+    def post(self, method: str, data: dict) -> FakeResponse:
+        backend = self.backend
+        backend.count(method)
+        if method == "images.list":
+            return FakeResponse(self._images_list(data))
+        if method == "figures.list":
+            return FakeResponse(self._figures_list(data))
+        if method == "jobs.entities.update-review-status":
+            backend.latency.wait(1)
+            with backend._lock:
+                backend.review_statuses[data[ApiField.ENTITY_ID]] = data[ApiField.STATUS]
+            return FakeResponse({"success": True})
+        if method == "image-tags.update-tag-value":
+            backend.latency.wait(1)
+            with backend._lock:
+                backend.tag_values[data["tagId"]] = data["value"]
+            return FakeResponse({"success": True})
+        raise NotImplementedError(f"Method {method!r} is not supported by the fake API")
+
+    @staticmethod
+    def _page(total: int, data: dict, default_per_page: int):
+        per_page = data.get(ApiField.PER_PAGE, default_per_page)
+        page = data.get(ApiField.PAGE, 1)
+        pages_count = max(1, -(-total // per_page))
+        return slice((page - 1) * per_page, page * per_page), pages_count
+
+    def _images_list(self, data: dict) -> dict:
+        dataset = self.backend.dataset
+        with self.backend._lock:
+            review_statuses = dict(self.backend.review_statuses)
+        indices = dataset.filter_images(data.get(ApiField.FILTERS), review_statuses)
+        indices = _apply_field_filters(_image_columns(dataset), indices, data.get(ApiField.FILTER))
+        page, pages_count = self._page(len(indices), data, self.backend.images_page_size)
+        entities = [dataset.image_json(idx) for idx in indices[page]]
+        self.backend.latency.wait(len(entities))
+        return {"total": len(indices), "pagesCount": pages_count, "entities": entities}
+
+    def _figures_list(self, data: dict) -> dict:
+        dataset = self.backend.dataset
+        figure_idx = np.arange(dataset.figures_count)
+        figure_idx = _apply_field_filters(
+            _figure_columns(dataset), figure_idx, data.get(ApiField.FILTER)
+        )
+        page, pages_count = self._page(len(figure_idx), data, self.backend.figures_page_size)
+        fields = data.get(ApiField.FIELDS, ["id", "imageId", "classId"])
+        entities = [dataset.figure_json(idx, fields) for idx in figure_idx[page]]
+        self.backend.latency.wait(len(entities))
+        return {"total": len(figure_idx), "pagesCount": pages_count, "entities": entities}
@@ -0,0 +1,68 @@
+"""
+Compares memory used by the light figures index against the previous
+``Dict[int, List[FigureInfo]]`` structure.
+
+Usage: python -m benchmarks.figure_index_memory [figures_count] [images_count]
+"""
+
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+
+
+def generate_entities(figures_count: int, images_count: int, classes_count: int = 50):
+    rng = np.random.default_rng(0)
+    image_ids = rng.integers(1, images_count + 1, figures_count)
+    class_ids = rng.integers(1, classes_count + 1, figures_count)
+    return [
+        {"id": idx + 1, "imageId": int(image_id), "classId": int(class_id)}
+        for idx, (image_id, class_id) in enumerate(zip(image_ids, class_ids))
+    ]
+
+
+def build_dict(entities):
+    empty = dict.fromkeys(sly.FigureInfo._fields)
+    images_figures = defaultdict(list)
+    for e in entities:
+        info = sly.FigureInfo(
+            **{**empty, "id": e["id"], "entity_id": e["imageId"], "class_id": e["classId"]}
+        )
+        images_figures[info.entity_id].append(info)
+    return dict(images_figures)
+
+
+def build_index(entities):
+    return FigureIndex.from_arrays([FigureIndex.entities_to_array(entities)])
+
+
+def measure(func, entities):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(entities)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def main(figures_count: int = 200_000, images_count: int = 20_000):
+    entities = generate_entities(figures_count, images_count)
+    print(f"{figures_count} figures on {images_count} images")
+    for name, func in (("dict of FigureInfo", build_dict), ("FigureIndex", build_index)):
+        result, current, peak, elapsed = measure(func, entities)
+        print(
+            f"{name:>20}: retained {current / 2**20:8.1f} MiB, "
+            f"peak {peak / 2**20:8.1f} MiB, built in {elapsed:6.2f} s"
+        )
+        del result
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
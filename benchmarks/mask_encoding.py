@@ -0,0 +1,81 @@
+"""
+Compares encode time and gallery payload size of bitmap figures
+sent as PNG data (current path) and as run lengths,
+and the size of bitmap data the browser keeps once run lengths are decoded back to PNG.
+
+Usage: python -m benchmarks.mask_encoding [figures_count] [image_size]
+"""
+
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+import supervisely as sly
+
+from src.ui.review_gallery.display_geometry import display_bitmap, reduce_mask
+
+
+def generate_labels(figures_count: int, image_size: int):
+    rng = np.random.default_rng(0)
+    obj_class = sly.ObjClass("segment", sly.Bitmap)
+    labels = []
+    for _ in range(figures_count):
+        mask = np.zeros((image_size, image_size), np.uint8)
+        for _ in range(rng.integers(1, 4)):
+            center = tuple(int(c) for c in rng.integers(image_size // 4, image_size * 3 // 4, 2))
+            axes = tuple(int(a) for a in rng.integers(image_size // 20, image_size // 5, 2))
+            cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 1, -1)
+        labels.append(sly.Label(sly.Bitmap(mask.astype(bool)), obj_class))
+    return labels
+
+
+def encode(labels, factor: int = 1, encoding: str = None) -> str:
+    figures = []
+    for label in labels:
+        figure = label.to_json()
+        if encoding is not None:
+            figure = display_bitmap(figure, label.geometry.data, factor, encoding)
+        figures.append(figure)
+    return json.dumps(figures)
+
+
+def decoded_size(labels, figures: list) -> int:
+    """
+    Size of bitmap data kept by the browser. Run lengths are decoded by the gallery scripts
+    to the same 1-bit PNG format :meth:`sly.Bitmap.data_2_base64` produces.
+    """
+    size = 0
+    for label, figure in zip(labels, figures):
+        rle = figure["bitmap"].get("rle")
+        if rle is None:
+            size += len(figure["bitmap"]["data"])
+        else:
+            mask = reduce_mask(label.geometry.data, rle["factor"])
+            size += len(sly.Bitmap.data_2_base64(mask))
+    return size
+
+
+def main(figures_count: int = 200, image_size: int = 2000):
+    labels = generate_labels(figures_count, image_size)
+    print(f"{figures_count} bitmap figures on {image_size}x{image_size} images")
+    for name, factor, encoding in (
+        ("png (current)", 1, None),
+        ("rle", 1, "rle"),
+        ("png, cell resolution", image_size // 300, "png"),
+        ("rle, cell resolution", image_size // 300, "rle"),
+    ):
+        start = time.perf_counter()
+        payload = encode(labels, factor, encoding)
+        elapsed = time.perf_counter() - start
+        decoded = decoded_size(labels, json.loads(payload))
+        print(
+            f"{name:>22}: payload {len(payload) / 2**20:8.2f} MiB, "
+            f"encoded in {elapsed * 1000:8.1f} ms, "
+            f"decoded in browser {decoded / 2**20:8.2f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,407 @@
+"""
+Offline benchmark of the review pipeline on the local fake API.
+
+Every case (dataset size and review mode) runs in a separate process and measures:
+- time to first batch: from the start of the review until the first batch is in the gallery;
+- batch switch latency: from applying a batch until the next one is in the gallery;
+- apply latency: time the reviewer waits for decisions of a batch to be accepted;
+- drain time: time until all decisions are sent after the last batch;
+- peak memory traced while the first batch is loaded.
+
+Results are saved to a JSON file and can be compared with a previous run.
+Failed cases are saved with their error and make the run exit with an error.
+
+Usage:
+    python -m benchmarks.review_pipeline --sizes 1000 10000 100000 500000
+    python -m benchmarks.review_pipeline --sizes 1000 --compare benchmarks/results/<previous>.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+# the app reads the server address, token and user context on import,
+# they are never used with the fake API
+os.environ.setdefault("SERVER_ADDRESS", "http://localhost")
+os.environ.setdefault("API_TOKEN", "0" * 128)
+os.environ.setdefault("TEAM_ID", "1")
+os.environ.setdefault("USER_ID", "1")
+
+MODES = {
+    "stream": ("none", False),  # images are listed page by page, batches are built on demand
+    "grouped": ("class", False),  # all images and figures are loaded and grouped by class
+    "filtered": ("class", True),  # same as grouped, images are filtered by tags and classes
+    # images are filtered by tags and classes and grouped by tag,
+    # only figures of the filtered classes are loaded
+    "tag_filtered": ("tag", True),
+}
+RESULTS_DIR = Path(__file__).parent / "results"
+# metrics compared between runs, lower is better for all of them
+METRICS = ["ttfb_s", "switch_ms.p50", "switch_ms.p95", "apply_ms.p50", "drain_s", "peak_memory_mb"]
+
+
+def _stats(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def _show_dialog(title: str, description: str, status: str = "info"):
+    # handlers report errors in dialogs, the benchmark case fails instead
+    if status == "error":
+        raise RuntimeError(f"{title}: {description}")
+
+
+class Pipeline:
+    """
+    Runs the steps of the review the same way the UI handlers do, on the fake API.
+    Images are loaded by the app functions with the globals they read set to the case settings.
+    The app data dir has to be set (``SLY_APP_DATA_DIR``), the app modules create files there.
+    """
+
+    def __init__(
+        self, backend, mode: str, batch_size: int, queue_path: str, adaptive: bool = False
+    ):
+        import supervisely as sly
+
+        import src.globals as g
+        import src.utils as u
+        from benchmarks.fake_api import FakeApi
+        from src.decision_queue import DecisionQueue
+        from src.metadata import MetadataCache
+        from src.prefetch import AnnotationsPrefetcher
+        from src.ui.review_gallery.widget import ReviewGallery
+
+        thread_local = threading.local()
+
+        def get_thread_api():
+            api = getattr(thread_local, "api", None)
+            if api is None:
+                api = thread_local.api = FakeApi(backend)
+            return api
+
+        g.api = FakeApi(backend)
+        g.metadata = MetadataCache(g.api, ttl=300)
+        u.get_thread_api = get_thread_api
+        sly.app.show_dialog = _show_dialog
+        # jobs are listed and the UI is built on import, after the API is replaced
+        import src.ui.control_panel as control_panel
+
+        # the benchmark sends decisions through its own queue
+        g.decision_queue.stop()
+        self.g, self.u, self.control_panel = g, u, control_panel
+        self.backend = backend
+        self.group_by, self.filter_images = MODES[mode]
+        self.batch_size = batch_size
+        self.adaptive = adaptive
+        self.job_info = backend.job_info()
+        self.project_meta = g.api.labeling_job.get_project_meta(self.job_info.id)
+        self.gallery = ReviewGallery(columns_number=4, empty_message="")
+        self.gallery.set_default_review_state("accepted")
+        self.prefetcher = AnnotationsPrefetcher(get_thread_api, depth=g.prefetch_depth)
+        self.decision_queue = DecisionQueue(
+            queue_path,
+            get_thread_api,
+            max_workers=g.submission_workers,
+            retries=g.submission_retries,
+        )
+        self.batches = None
+        self.batch_lengths = []
+
+    def _settings(self):
+        g = self.g
+        return g.Settings(
+            batch_size=self.batch_size,
+            adaptive_batch_size=self.adaptive,
+            group_by=self.group_by,
+            tags=list(self.project_meta.tag_metas)[:2] if self.filter_images else [],
+            classes=list(self.project_meta.obj_classes)[:3] if self.filter_images else [],
+            filter_images=self.filter_images,
+            tags_editing=False,
+            default_decision="accepted",
+            use_cache=False,
+        )
+
+    def _filters(self) -> list:
+        g = self.g
+        filters = [{"type": "job", "data": {"jobId": self.job_info.id, "status": ["done", "none"]}}]
+        if g.settings.filter_images:
+            filters.append(
+                {
+                    "type": "images_tag",
+                    "data": {
+                        "tags": [{"tagId": t.sly_id} for t in g.settings.tags],
+                        "include": True,
+                    },
+                }
+            )
+        return filters
+
+    def _load_images(self):
+        """Builds batches like the "Start review" handler does."""
+        from src.batching import ImageBatches
+
+        g, u, control_panel = self.g, self.u, self.control_panel
+        g.settings = self._settings()
+        g.job_info = self.job_info
+        g.job_ds_info = g.metadata.dataset_info(self.job_info.dataset_id)
+        g.job_project_meta = self.project_meta
+        if g.settings.group_by == "none" and not g.settings.filter_images:
+            _, pages = u.list_filtered_images_pages(
+                self.job_info.dataset_id, self._filters(), per_page=g.images_page_size
+            )
+            return ImageBatches(pages, self.batch_size, control_panel.create_batch_budget())
+
+        images, figures = control_panel.load_review_images(self._filters()) or ([], None)
+        return control_panel.create_image_batches(
+            images, self.batch_size, control_panel.create_batch_budget(figures)
+        )
+
+    def _show(self, idx: int):
+        self.gallery.clean_up()
+        batch = self.batches[idx]
+        start = time.perf_counter()
+        anns = self.prefetcher.get(idx)
+        self.gallery.extend(batch, anns, project_meta=self.project_meta)
+        if self.batches.budget is not None:
+            self.batches.budget.observe(batch, time.perf_counter() - start)
+        self.prefetcher.schedule(idx)
+        self.batch_lengths.append(len(batch))
+
+    def first_batch(self) -> float:
+        start = time.perf_counter()
+        self.batches = self._load_images()
+        self.prefetcher.start(self.job_info.id, self.batches)
+        self._show(0)
+        return time.perf_counter() - start
+
+    def apply(self, idx: int) -> float:
+        start = time.perf_counter()
+        review_states = self.gallery.get_review_states()
+        review_statuses = {image.id: review_states[str(image.id)] for image in self.batches[idx]}
+        # every second image gets its first tag changed to check tag updates too
+        tag_updates = {
+            image.tags[0]["id"]: "changed"
+            for image in self.batches[idx][::2]
+            if image.tags and review_statuses[image.id] == "accepted"
+        }
+        self.decision_queue.put(self.job_info.id, review_statuses, tag_updates)
+        return time.perf_counter() - start
+
+    def switch(self, idx: int) -> float:
+        start = time.perf_counter()
+        self.gallery.clean_states()
+        self._show(idx)
+        return time.perf_counter() - start
+
+    def close(self):
+        """Cancels prefetching and waits for the decision queue worker to stop."""
+        self.prefetcher.reset()
+        self.decision_queue.stop()
+
+
+def run_case(args) -> dict:
+    """Runs one case in the current process and returns its metrics."""
+    from benchmarks.fake_api import FakeBackend, Latency, SyntheticDataset
+
+    dataset = SyntheticDataset(args.single_size, figures_per_image=args.figures_per_image)
+    latency = Latency(request_ms=args.latency_ms, item_ms=args.item_ms)
+    result = {
+        "size": args.single_size,
+        "mode": args.single_mode,
+        "figures": dataset.figures_count,
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["SLY_APP_DATA_DIR"] = os.path.join(tmp_dir, "app_data")
+        # memory is traced in a separate run, tracing slows down the timed one
+        backend = FakeBackend(dataset, latency)
+        pipeline = Pipeline(
+            backend,
+            args.single_mode,
+            args.batch_size,
+            os.path.join(tmp_dir, "memory.sqlite3"),
+            args.adaptive,
+        )
+        try:
+            tracemalloc.start()
+            pipeline.first_batch()
+            result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+            pipeline.close()
+
+        backend = FakeBackend(dataset, latency)
+        pipeline = Pipeline(
+            backend,
+            args.single_mode,
+            args.batch_size,
+            os.path.join(tmp_dir, "timed.sqlite3"),
+            args.adaptive,
+        )
+        try:
+            pipeline.decision_queue.start()
+            result["ttfb_s"] = pipeline.first_batch()
+            switches, applies = [], []
+            for idx in range(1, args.batches + 1):
+                if not pipeline.batches.exists(idx):
+                    break
+                time.sleep(args.think_time)  # reviewer looks through the batch
+                applies.append(pipeline.apply(idx - 1) * 1000)
+                switches.append(pipeline.switch(idx) * 1000)
+            start = time.perf_counter()
+            pipeline.decision_queue.join(pipeline.job_info.id)
+            result["drain_s"] = time.perf_counter() - start
+            result["switch_ms"] = _stats(switches)
+            result["apply_ms"] = _stats(applies)
+            result["batch_lengths"] = pipeline.batch_lengths
+            result["calls"] = dict(backend.calls)
+        finally:
+            # the queue journal is in the temporary dir
+            pipeline.close()
+    return result
+
+
+def _metric(result: dict, name: str):
+    value = result
+    for key in name.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_header():
+    print(f"{'size':>8} {'mode':>9} " + " ".join(f"{name:>15}" for name in METRICS))
+
+
+def _print_row(result: dict):
+    if "error" in result:
+        print(f"{result['size']:>8} {result['mode']:>9} failed: {result['error']}")
+        return
+    values = []
+    for name in METRICS:
+        value = _metric(result, name)
+        values.append(f"{value:>15.3f}" if value is not None else f"{'-':>15}")
+    print(f"{result['size']:>8} {result['mode']:>9} " + " ".join(values))
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> int:
+    """Prints relative changes against the baseline file and returns the number of regressions."""
+    baseline = {
+        (r["size"], r["mode"]): r
+        for r in json.loads(Path(baseline_path).read_text())["results"]
+        if "error" not in r
+    }
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression threshold {threshold:.0%}):")
+    for result in results:
+        base = baseline.get((result["size"], result["mode"]))
+        if base is None or "error" in result:
+            continue
+        changes = []
+        for name in METRICS:
+            new, old = _metric(result, name), _metric(base, name)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            mark = ""
+            if change > threshold:
+                mark = " REGRESSION"
+                regressions += 1
+            changes.append(f"{name} {change:+.1%}{mark}")
+        print(f"{result['size']:>8} {result['mode']:>9}: " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 500000])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--latency-ms", type=float, default=50, help="latency of every request")
+    parser.add_argument("--item-ms", type=float, default=0.01, help="latency per returned item")
+    parser.add_argument("--figures-per-image", type=float, default=3)
+    parser.add_argument("--batch-size", type=int, default=40)
+    parser.add_argument("--batches", type=int, default=5, help="number of batch switches")
+    parser.add_argument("--adaptive", action="store_true", help="cap batches by figures count")
+    parser.add_argument("--think-time", type=float, default=0.5, help="seconds spent on a batch")
+    parser.add_argument(
+        "--output", default=None, help="results file, saved to results dir by default"
+    )
+    parser.add_argument("--compare", default=None, help="results file to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative regression threshold"
+    )
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--single-mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_size is not None:
+        import supervisely as sly
+
+        sly.logger.setLevel("WARNING")
+        print(json.dumps(run_case(args)))
+        return
+
+    results = []
+    _print_header()
+    for size in args.sizes:
+        for mode in args.modes:
+            command = [sys.executable, "-m", "benchmarks.review_pipeline"]
+            command += sys.argv[1:] + ["--single-size", str(size), "--single-mode", mode]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode == 0:
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            else:
+                # failed cases are kept in the results, so they are not mistaken for skipped ones
+                print(f"Case {size} {mode} failed:\n{completed.stderr}", file=sys.stderr)
+                error = (completed.stderr.strip().splitlines() or ["unknown error"])[-1]
+                results.append({"size": size, "mode": mode, "error": error})
+            _print_row(results[-1])
+
+    created_at = datetime.now(timezone.utc)
+    output = Path(args.output or RESULTS_DIR / f"{created_at:%Y%m%d-%H%M%S}_{_git_commit()}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    config = {k: v for k, v in vars(args).items() if not k.startswith("single_")}
+    report = {
+        "created_at": created_at.isoformat(),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "config": config,
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults are saved to {output}")
+
+    failed = sum("error" in result for result in results)
+    if args.compare:
+        if compare(results, args.compare, args.threshold) > 0:
+            sys.exit(1)
+    if failed > 0:
+        print(f"{failed} cases failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
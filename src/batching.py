@@ -0,0 +1,165 @@
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+
+
+class BatchBudget:
+    """
+    Caps image batches by their estimated weight instead of the number of images only.
+
+    Weight of an image is ``image_weight`` plus the number of its figures, taken from the figure
+    index or from :attr:`sly.ImageInfo.labels_count` if the index is not loaded.
+    The budget adapts to the measured time of showing a batch (waiting for its annotations and
+    rendering them), so showing batches takes about ``target_s`` seconds.
+
+    :param figures: Index of the job figures.
+    :type figures: FigureIndex, optional
+    :param budget: Initial weight budget of a batch.
+    :type budget: float
+    :param target_s: Target time of showing a batch in seconds.
+    :type target_s: float
+    :param image_weight: Weight of an image without figures, in figures.
+    :type image_weight: float
+    :param min_budget: Lower bound of the adapted budget.
+    :type min_budget: float
+    :param max_budget: Upper bound of the adapted budget.
+    :type max_budget: float
+    :param smoothing: Weight of the last measurement in the moving average of time per weight.
+    :type smoothing: float
+    """
+
+    def __init__(
+        self,
+        figures: Optional[FigureIndex] = None,
+        budget: float = 2000,
+        target_s: float = 1.0,
+        image_weight: float = 10,
+        min_budget: float = 100,
+        max_budget: float = 50000,
+        smoothing: float = 0.3,
+    ):
+        self._figures = figures
+        self.budget = budget
+        self._target_s = target_s
+        self._image_weight = image_weight
+        self._min_budget = min_budget
+        self._max_budget = max_budget
+        self._smoothing = smoothing
+        self._seconds_per_weight = None
+        self._lock = threading.Lock()
+
+    def weights(self, images: List[sly.ImageInfo]) -> np.ndarray:
+        """Returns estimated weight of every image."""
+        if self._figures is not None:
+            counts = self._figures.figures_count(image.id for image in images)
+        else:
+            counts = np.array([image.labels_count or 0 for image in images], dtype=np.int64)
+        return counts + self._image_weight
+
+    def take(self, images: List[sly.ImageInfo]) -> int:
+        """Returns the number of leading images that fit into the budget, at least one."""
+        cumulative = np.cumsum(self.weights(images))
+        with self._lock:
+            budget = self.budget
+        return max(1, int(np.searchsorted(cumulative, budget, side="right")))
+
+    def observe(self, images: List[sly.ImageInfo], seconds: float):
+        """Updates the budget with the measured time of showing the batch."""
+        weight = float(self.weights(images).sum())
+        if weight <= 0:
+            return
+        with self._lock:
+            rate = seconds / weight
+            if self._seconds_per_weight is None:
+                self._seconds_per_weight = rate
+            else:
+                self._seconds_per_weight += self._smoothing * (rate - self._seconds_per_weight)
+            if self._seconds_per_weight > 0:
+                budget = self._target_s / self._seconds_per_weight
+                self.budget = min(max(budget, self._min_budget), self._max_budget)
+        sly.logger.debug(
+            f"Batch of {len(images)} images with weight {weight:.0f} is shown in {seconds:.3f} s, "
+            f"batch budget is {self.budget:.0f}"
+        )
+
+
+class ImageBatches:
+    """
+    List-like access to image batches that are built on demand from pages of images.
+    Pages are pulled from the iterator only when a batch that is not built yet is requested,
+    so the first batch is available as soon as its images are known.
+
+    :param pages: Iterator over lists of images, e.g. pages of the API response.
+    :type pages: Iterable[List[sly.ImageInfo]]
+    :param batch_size: Number of images in every batch except the last one.
+        With ``budget`` it is the maximum number of images in a batch.
+    :type batch_size: int
+    :param budget: Budget to cap batches by their weight. Batches are built one by one when they
+        are requested, so the budget adapted on a shown batch applies to the batches built after it.
+        Batches are built ahead of time for prefetching, so a measured batch affects the batch
+        the prefetch depth after it.
+    :type budget: BatchBudget, optional
+    """
+
+    def __init__(
+        self,
+        pages: Iterable[List[sly.ImageInfo]],
+        batch_size: int,
+        budget: Optional[BatchBudget] = None,
+    ):
+        self._pages: Iterator[List[sly.ImageInfo]] = iter(pages)
+        self._batch_size = batch_size
+        self.budget = budget
+        self._batches: List[List[sly.ImageInfo]] = []
+        self._buffer: List[sly.ImageInfo] = []
+        self._start = 0  # position of the first image in the buffer that is not in a batch yet
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_list(
+        cls,
+        img_infos: List[sly.ImageInfo],
+        batch_size: int,
+        budget: Optional[BatchBudget] = None,
+    ) -> "ImageBatches":
+        return cls([img_infos], batch_size, budget)
+
+    def _build(self, count: int):
+        with self._lock:
+            while len(self._batches) < count:
+                remaining = len(self._buffer) - self._start
+                if remaining >= self._batch_size or (self._exhausted and remaining > 0):
+                    candidates = self._buffer[self._start : self._start + self._batch_size]
+                    size = self.budget.take(candidates) if self.budget is not None else None
+                    self._batches.append(candidates[:size])
+                    self._start += len(self._batches[-1])
+                elif self._exhausted:
+                    break
+                else:
+                    try:
+                        page = next(self._pages)
+                    except StopIteration:
+                        self._exhausted = True
+                        continue
+                    self._buffer = self._buffer[self._start :] + list(page)
+                    self._start = 0
+
+    def exists(self, idx: int) -> bool:
+        """Checks if the batch with the given index exists, building it if needed."""
+        self._build(idx + 1)
+        return 0 <= idx < len(self._batches)
+
+    def __getitem__(self, idx: int) -> List[sly.ImageInfo]:
+        if not self.exists(idx):
+            raise IndexError(f"Batch index {idx} is out of range")
+        return self._batches[idx]
+
+    def __len__(self) -> int:
+        """Returns the total number of batches. Pulls all remaining pages."""
+        self._build(float("inf"))
+        return len(self._batches)
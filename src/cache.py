@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import numpy as np
+import supervisely as sly
+from supervisely.api.labeling_job_api import LabelingJobInfo
+
+from src.figure_index import FigureIndex
+
+
+class ReviewCache:
+    """
+    Persistent SQLite cache of job image infos and light figures index.
+
+    Every entry is stored with a version string built from the job and dataset infos,
+    the SDK version and the fields of :class:`sly.ImageInfo` (image infos are stored as tuples).
+    An entry with a different version is considered stale and removed on read.
+    Total size of entries is bounded, least recently used entries are evicted first.
+
+    :param path: Path to the SQLite database file.
+    :type path: str
+    :param max_size_mb: Maximum total size of cached entries in megabytes.
+    :type max_size_mb: int
+    """
+
+    IMAGES = "images"
+    FIGURES = "figures"
+
+    def __init__(self, path: str, max_size_mb: int = 1024):
+        self._path = path
+        self._max_size = max_size_mb * 2**20
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "job_id INTEGER, kind TEXT, version TEXT, data BLOB, size INTEGER, accessed_at REAL, "
+                "PRIMARY KEY (job_id, kind))"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def version(job_info: LabelingJobInfo, dataset_info: sly.DatasetInfo) -> str:
+        """
+        Returns version of the job data. Changes when the dataset or job progress changes,
+        or when the SDK is updated.
+        """
+        return json.dumps(
+            [
+                sly.__version__,
+                sly.ImageInfo._fields,
+                dataset_info.id,
+                dataset_info.updated_at,
+                dataset_info.images_count,
+                job_info.status,
+                job_info.finished_images_count,
+                job_info.accepted_images_count,
+                job_info.rejected_images_count,
+                job_info.progress_images_count,
+            ]
+        )
+
+    def _get(self, job_id: int, kind: str, version: str) -> Optional[bytes]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT version, data FROM entries WHERE job_id = ? AND kind = ?", (job_id, kind)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != version:
+                conn.execute("DELETE FROM entries WHERE job_id = ? AND kind = ?", (job_id, kind))
+                sly.logger.debug(f"Cached {kind} of job {job_id} are outdated")
+                return None
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE job_id = ? AND kind = ?",
+                (time.time(), job_id, kind),
+            )
+        sly.logger.debug(f"Cached {kind} of job {job_id} are used")
+        return row[1]
+
+    def _put(self, job_id: int, kind: str, version: str, data: bytes):
+        if len(data) > self._max_size:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, version, data, len(data), time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            rows = conn.execute(
+                "SELECT job_id, kind, size FROM entries ORDER BY accessed_at ASC"
+            ).fetchall()
+            for row_job_id, row_kind, size in rows:
+                if total <= self._max_size:
+                    break
+                conn.execute(
+                    "DELETE FROM entries WHERE job_id = ? AND kind = ?", (row_job_id, row_kind)
+                )
+                total -= size
+                sly.logger.debug(f"Cached {row_kind} of job {row_job_id} are evicted")
+
+    def get_images(self, job_id: int, version: str) -> Optional[List[sly.ImageInfo]]:
+        data = self._get(job_id, self.IMAGES, version)
+        if data is None:
+            return None
+        return [sly.ImageInfo(*info) for info in pickle.loads(data)]
+
+    def put_images(self, job_id: int, version: str, images: List[sly.ImageInfo]):
+        self._put(job_id, self.IMAGES, version, pickle.dumps([tuple(info) for info in images]))
+
+    def get_figures(self, job_id: int, version: str) -> Optional[FigureIndex]:
+        data = self._get(job_id, self.FIGURES, version)
+        if data is None:
+            return None
+        arrays = np.load(io.BytesIO(data))
+        return FigureIndex(arrays["figure_ids"], arrays["image_ids"], arrays["class_ids"])
+
+    def put_figures(self, job_id: int, version: str, figures: FigureIndex):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            figure_ids=figures.figure_ids,
+            image_ids=figures.figure_image_ids,
+            class_ids=figures.class_ids,
+        )
+        self._put(job_id, self.FIGURES, version, buffer.getvalue())
@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import supervisely as sly
+
+from src.metrics import Metrics
+from src.submission import submit_concurrently
+
+
+class DecisionQueue:
+    """
+    Durable write-behind queue of review decisions.
+
+    Decisions are journaled into a local SQLite database and sent to the API by a background
+    worker, so the reviewer does not wait for the requests. Journaled decisions survive restarts
+    of the app and are replayed when the worker starts again.
+    Tag value updates of a drained chunk are always sent before review statuses.
+    A new decision replaces the journaled one for the same entity, so the queue never holds
+    two decisions that could be applied out of order.
+
+    :param path: Path to the SQLite database file.
+    :type path: str
+    :param api_factory: Function returning an API instance owned by the calling thread.
+    :type api_factory: Callable[[], sly.Api]
+    :param max_workers: Maximum number of requests running at the same time.
+    :type max_workers: int
+    :param retries: Number of immediate attempts for every request.
+    :type retries: int
+    :param max_attempts: Number of drains a request is tried in before it is marked as failed.
+    :type max_attempts: int
+    :param metrics: Metrics to record the duration of sending every chunk of decisions to.
+    :type metrics: Metrics, optional
+    """
+
+    REVIEW_STATUS = "review_status"
+    TAG_VALUE = "tag_value"
+    PENDING = "pending"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        path: str,
+        api_factory: Callable[[], sly.Api],
+        max_workers: int = 8,
+        retries: int = 3,
+        max_attempts: int = 5,
+        chunk_size: int = 200,
+        metrics: Optional[Metrics] = None,
+    ):
+        self._path = path
+        self._api_factory = api_factory
+        self._max_workers = max_workers
+        self._retries = retries
+        self._max_attempts = max_attempts
+        self._chunk_size = chunk_size
+        self._metrics = metrics
+        self._wakeup = threading.Event()
+        self._changed = threading.Condition()  # notified whenever decisions are sent or changed
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[int, int], None]] = []
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, job_id INTEGER, entity_id INTEGER, "
+                "value TEXT, status TEXT, attempts INTEGER DEFAULT 0, error TEXT, created_at REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS decisions_entity ON decisions (kind, job_id, entity_id)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self._path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_listener(self, callback: Callable[[int, int], None]):
+        """Registers callback called with pending and failed counts whenever they change."""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+        pending, failed = self.counts()
+        for callback in self._listeners:
+            try:
+                callback(pending, failed)
+            except Exception as e:
+                sly.logger.warning(f"Decision queue listener failed: {repr(e)}")
+
+    @staticmethod
+    def _job_condition(job_id: Optional[int]) -> Tuple[str, tuple]:
+        if job_id is None:
+            return "", ()
+        return " AND job_id = ?", (job_id,)
+
+    def counts(self, job_id: Optional[int] = None) -> Tuple[int, int]:
+        """Returns numbers of pending and failed decisions of the job, or of all jobs if None."""
+        condition, params = self._job_condition(job_id)
+        with self._connect() as conn:
+            rows = dict(
+                conn.execute(
+                    f"SELECT status, COUNT(*) FROM decisions WHERE 1{condition} GROUP BY status",
+                    params,
+                ).fetchall()
+            )
+        return rows.get(self.PENDING, 0), rows.get(self.FAILED, 0)
+
+    def put(self, job_id: int, review_statuses: Dict[int, str], tag_values: Dict[int, object]):
+        """
+        Journals review statuses by image ID and tag values by tag ID in one transaction.
+        Pending and failed decisions of the same entities are replaced.
+        """
+        now = time.time()
+        rows = [
+            (self.TAG_VALUE, job_id, tag_id, json.dumps(value), self.PENDING, now)
+            for tag_id, value in tag_values.items()
+        ]
+        rows.extend(
+            (self.REVIEW_STATUS, job_id, image_id, json.dumps(status), self.PENDING, now)
+            for image_id, status in review_statuses.items()
+        )
+        with self._connect() as conn:
+            # a chunk is sent concurrently, older decisions must not be applied after newer ones
+            conn.executemany(
+                "DELETE FROM decisions WHERE kind = ? AND job_id = ? AND entity_id = ?",
+                [row[:3] for row in rows],
+            )
+            conn.executemany(
+                "INSERT INTO decisions (kind, job_id, entity_id, value, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._wakeup.set()
+        self._notify()
+
+    def retry_failed(self, job_id: Optional[int] = None):
+        """Moves failed decisions of the job, or of all jobs if ``job_id`` is None, to the queue."""
+        condition, params = self._job_condition(job_id)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE decisions SET status = ?, attempts = 0 WHERE status = ?{condition}",
+                (self.PENDING, self.FAILED, *params),
+            )
+        self._wakeup.set()
+        self._notify()
+
+    def discard_failed(self, job_id: Optional[int] = None) -> int:
+        """
+        Removes failed decisions of the job, or of all jobs if ``job_id`` is None, from the queue.
+        Returns the number of discarded decisions.
+        """
+        condition, params = self._job_condition(job_id)
+        with self._connect() as conn:
+            discarded = conn.execute(
+                f"DELETE FROM decisions WHERE status = ?{condition}", (self.FAILED, *params)
+            ).rowcount
+        if discarded > 0:
+            sly.logger.warning(f"Discarded {discarded} failed review decisions")
+        self._notify()
+        return discarded
+
+    def start(self):
+        """Starts the background worker. Decisions left from previous runs are replayed."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        pending, failed = self.counts()
+        if pending > 0:
+            sly.logger.info(f"Replaying {pending} unsent review decisions")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="decision-queue", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the background worker and waits until the chunk being sent is finished."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def join(self, job_id: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until there are no pending decisions of the job, or of all jobs if ``job_id`` is None.
+        Failed decisions are not waited for. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self.counts(job_id)[0] > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stop.is_set():
+                if self._metrics is None:
+                    drained = self._drain_chunk()
+                else:
+                    with self._metrics.span("send_decisions"):
+                        drained = self._drain_chunk()
+                if not drained:
+                    break
+
+    def _request(self, kind: str, job_id: int, entity_id: int, value):
+        api = self._api_factory()
+        if kind == self.TAG_VALUE:
+            response = api.image.update_tag_value(entity_id, value=value)
+            if not response.get("success", False):
+                raise RuntimeError(f"Error in updating tag {entity_id}")
+            return response
+        return api.labeling_job.set_entity_review_status(job_id, entity_id, value)
+
+    def _drain_chunk(self) -> bool:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, job_id, entity_id, value, attempts FROM decisions "
+                "WHERE status = ? ORDER BY id LIMIT ?",
+                (self.PENDING, self._chunk_size),
+            ).fetchall()
+        if not rows:
+            return False
+
+        done, errors = [], {}
+        for kind in (self.TAG_VALUE, self.REVIEW_STATUS):
+            tasks = {
+                row_id: partial(self._request, kind, job_id, entity_id, json.loads(value))
+                for row_id, row_kind, job_id, entity_id, value, _ in rows
+                if row_kind == kind
+            }
+            result = submit_concurrently(
+                tasks, max_workers=self._max_workers, retries=self._retries
+            )
+            done.extend(result.results.keys())
+            errors.update(result.failed)
+
+        attempts = {row[0]: row[5] for row in rows}
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM decisions WHERE id = ?", [(row_id,) for row_id in done])
+            for row_id, e in errors.items():
+                status = self.FAILED if attempts[row_id] + 1 >= self._max_attempts else self.PENDING
+                conn.execute(
+                    "UPDATE decisions SET attempts = attempts + 1, status = ?, error = ? WHERE id = ?",
+                    (status, repr(e), row_id),
+                )
+                sly.logger.error(f"Error in applying review decision {row_id}: {repr(e)}")
+        sly.logger.debug(f"Applied {len(done)} review decisions, {len(errors)} failed")
+        self._notify()
+        if errors and not done:
+            # nothing succeeded, back off before the next attempt
+            self._stop.wait(min(2 ** max(attempts[row_id] for row_id in errors), 60))
+        return True
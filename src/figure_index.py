@@ -0,0 +1,64 @@
+from typing import Iterable, List
+
+import numpy as np
+
+
+class FigureIndex:
+    """
+    Compact columnar index of light figures (figure ID, image ID, class ID).
+
+    Figures are stored in parallel int arrays sorted by image ID.
+    Figures of the image with index ``i`` in :attr:`image_ids` are in range
+    ``offsets[i]:offsets[i + 1]`` of :attr:`figure_ids` and :attr:`class_ids`.
+    Use it only for filtering and sorting purposes.
+    """
+
+    def __init__(self, figure_ids: np.ndarray, image_ids: np.ndarray, class_ids: np.ndarray):
+        order = np.argsort(image_ids, kind="stable")
+        self.figure_ids = np.ascontiguousarray(figure_ids[order], dtype=np.int64)
+        self.figure_image_ids = np.ascontiguousarray(image_ids[order], dtype=np.int64)
+        self.class_ids = np.ascontiguousarray(class_ids[order], dtype=np.int64)
+        self.image_ids, starts = np.unique(self.figure_image_ids, return_index=True)
+        self.offsets = np.append(starts, len(self.figure_ids)).astype(np.int64)
+
+    @staticmethod
+    def entities_to_array(entities: List[dict]) -> np.ndarray:
+        """Converts "figures.list" entities with "id", "imageId" and "classId" fields to ``(N, 3)`` array."""
+        return np.array(
+            [(e["id"], e["imageId"], e["classId"]) for e in entities], dtype=np.int64
+        ).reshape(-1, 3)
+
+    @classmethod
+    def from_arrays(cls, arrays: List[np.ndarray]) -> "FigureIndex":
+        """Builds index from ``(N, 3)`` arrays returned by :meth:`entities_to_array`."""
+        data = np.concatenate(arrays) if arrays else np.empty((0, 3), dtype=np.int64)
+        return cls(data[:, 0], data[:, 1], data[:, 2])
+
+    def __len__(self) -> int:
+        return len(self.figure_ids)
+
+    def figures_count(self, image_ids: Iterable[int]) -> np.ndarray:
+        """Returns number of figures for every given image ID."""
+        image_ids = np.asarray(list(image_ids), dtype=np.int64)
+        result = np.zeros(len(image_ids), dtype=np.int64)
+        if len(self.image_ids) == 0:
+            return result
+        counts = np.diff(self.offsets)
+        pos = np.clip(np.searchsorted(self.image_ids, image_ids), 0, len(self.image_ids) - 1)
+        found = self.image_ids[pos] == image_ids
+        result[found] = counts[pos[found]]
+        return result
+
+    def images_with_classes(self, class_ids: Iterable[int]) -> np.ndarray:
+        """Returns sorted IDs of images that have at least one figure of the given classes."""
+        mask = np.isin(self.class_ids, np.fromiter(class_ids, dtype=np.int64))
+        return np.unique(self.figure_image_ids[mask])
+
+    def images_with_figures(self) -> np.ndarray:
+        """Returns sorted IDs of images that have at least one figure."""
+        return self.image_ids
+
+    def subset(self, image_ids: Iterable[int]) -> "FigureIndex":
+        """Returns a new index containing only figures of the given images."""
+        mask = np.isin(self.figure_image_ids, np.fromiter(image_ids, dtype=np.int64))
+        return FigureIndex(self.figure_ids[mask], self.figure_image_ids[mask], self.class_ids[mask])
@@ -0,0 +1,54 @@
+from typing import Iterable, List, Optional
+
+import numpy as np
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+
+
+class ImageFilter:
+    """
+    Evaluates tag and class predicates for all images at once.
+    Tags are kept as sparse (image row, tag ID) pairs and classes are looked up in the figures index,
+    so no per-call structure grows with the number of images times the number of elements.
+    If nothing is selected in a category, the predicate matches images lacking all its elements.
+
+    :param images: Images to filter.
+    :type images: List[sly.ImageInfo]
+    :param figures: Light figures index of the images. Required only for class predicates.
+    :type figures: FigureIndex, optional
+    """
+
+    def __init__(self, images: List[sly.ImageInfo], figures: Optional[FigureIndex] = None):
+        self._images = images
+        self._figures = figures
+        self.image_ids = np.array([img.id for img in images], dtype=np.int64)
+        self._tag_rows = np.array(
+            [idx for idx, img in enumerate(images) for _ in img.tags], dtype=np.int64
+        )
+        self._tag_ids = np.array(
+            [tag["tagId"] for img in images for tag in img.tags], dtype=np.int64
+        )
+
+    def has_tags(self, tag_ids: Iterable[int]) -> np.ndarray:
+        """Mask of images with any of the tags, or without tags if ``tag_ids`` is empty."""
+        tag_ids = np.fromiter(tag_ids, dtype=np.int64)
+        result = np.zeros(len(self._images), dtype=bool)
+        if len(tag_ids) == 0:
+            result[self._tag_rows] = True
+            return ~result
+        result[self._tag_rows[np.isin(self._tag_ids, tag_ids)]] = True
+        return result
+
+    def has_classes(self, class_ids: Iterable[int]) -> np.ndarray:
+        """Mask of images with any of the classes, or without figures if ``class_ids`` is empty."""
+        if self._figures is None:
+            raise ValueError("Figures index is required to filter images by classes")
+        class_ids = np.fromiter(class_ids, dtype=np.int64)
+        if len(class_ids) == 0:
+            return ~np.isin(self.image_ids, self._figures.images_with_figures())
+        return np.isin(self.image_ids, self._figures.images_with_classes(class_ids))
+
+    def select(self, mask: np.ndarray) -> List[sly.ImageInfo]:
+        """Returns images matched by the mask keeping their order."""
+        return [self._images[idx] for idx in np.flatnonzero(mask)]
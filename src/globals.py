@@ -3,16 +3,29 @@ from dataclasses import dataclass
 from typing import List
 
 import supervisely as sly
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from supervisely.api.labeling_job_api import LabelingJobInfo
 
+from src.batching import ImageBatches
+from src.cache import ReviewCache
+from src.decision_queue import DecisionQueue
+from src.metadata import MetadataCache
+from src.metrics import Metrics
+from src.profiling import HandlerProfiler
 from src.ui.review_gallery.widget import ReviewGallery
 
 if sly.is_development():
     load_dotenv("local.env")
     load_dotenv(os.path.expanduser("~/supervisely.env"))
 
-api = sly.Api.from_env()
+metrics = Metrics()  # timing spans and API latencies, exposed on the /metrics route
+api = metrics.instrument_api(sly.Api.from_env())
+# handlers are profiled with "PROFILE_HANDLERS=true", slowest profiles are kept in app data dir
+profiler = HandlerProfiler(
+    enabled=sly.env.flag_from_env(os.environ.get("PROFILE_HANDLERS", "false")),
+    keep=int(os.environ.get("PROFILE_KEEP_SLOWEST", 5)),
+)
 
 selected_job = os.environ.get("modal.state.slyJobId", None)
 
@@ -20,18 +33,20 @@ selected_job = os.environ.get("modal.state.slyJobId", None)
 @dataclass
 class Settings:
     batch_size: int
+    adaptive_batch_size: bool
     group_by: str
     tags: List[sly.Tag]
     classes: List[sly.ObjClass]
     filter_images: bool
     tags_editing: bool
     default_decision: str
+    use_cache: bool
 
 
 # ----------------------------------------- Init Section ----------------------------------------- #
 job_info: LabelingJobInfo = None
 job_ds_info: sly.DatasetInfo = None
-image_batches = []
+image_batches: ImageBatches = None
 current_batch_idx = 0
 review_images_cnt = 0
 on_refresh = False
@@ -47,4 +62,25 @@ accepted_statuses_for_review = ["done", "none"]  # ? remove none
 exclude_job_statuses = ["pending", "completed"]
 image_gallery: ReviewGallery = None
 change_settings_button: sly.app.widgets.Button = None
+prefetch_depth = 2  # number of batches to fetch ahead of the current one
+prefetcher = None
+submission_workers = 8  # max number of concurrent review requests
+submission_retries = 3
+figures_fetch_workers = 4  # max number of figure pages fetched concurrently
+figures_image_ids_chunk_size = 500  # number of image IDs in a figures request of a partial job
+batch_weight_budget = 2000  # initial weight of an adaptive batch: figures + 10 per image
+batch_image_weight = 10  # weight of an image without figures in an adaptive batch
+batch_show_target_s = 1.0  # adaptive batches are resized to be shown in about this time
+images_page_size = 1000  # number of images requested at once when batches are built on demand
+cache: ReviewCache = None
+cache_max_size_mb = 1024
+decision_queue: DecisionQueue = None
+decision_queue_finish_timeout = 60  # seconds to wait for unsent decisions before completing the job
+projects_fetch_workers = 8  # max number of workspaces requested concurrently on jobs loading
+metadata = MetadataCache(api, ttl=300)  # job, dataset and project infos shared by handlers
+geometry_tolerance_px = float(os.environ.get("GEOMETRY_TOLERANCE_PX", 1.0))  # 0 sends full geometry
+mask_encoding = os.environ.get("MASK_ENCODING", "png")  # "rle" sends bitmap masks as run lengths
+# figures of gallery cells are sent when cells are scrolled into view, useful for large batches
+lazy_figures = sly.env.flag_from_env(os.environ.get("LAZY_FIGURES", "false"))
+project_types = TTLCache(maxsize=10000, ttl=24 * 60 * 60)  # project ID -> project type
 # ----------------------------------------------- - ---------------------------------------------- #
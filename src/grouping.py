@@ -0,0 +1,107 @@
+from collections import defaultdict
+from typing import List, Sequence
+
+import numpy as np
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+
+
+def _meta_ranks(metas: Sequence) -> dict:
+    ranks = {}
+    for rank, meta in enumerate(metas):
+        if meta.sly_id is not None and meta.sly_id not in ranks:
+            ranks[meta.sly_id] = rank
+    return ranks
+
+
+def class_ranks(
+    images: List[sly.ImageInfo], figures: FigureIndex, obj_classes: Sequence[sly.ObjClass]
+) -> np.ndarray:
+    """
+    Returns the position of the first class (in project order) present on every image.
+    Images without any of the classes get ``len(obj_classes)``.
+    """
+    no_rank = len(obj_classes)
+    result = np.full(len(images), no_rank, dtype=np.int64)
+    ranks = _meta_ranks(obj_classes)
+    if not images or not ranks or len(figures) == 0:
+        return result
+    ids = np.fromiter(ranks.keys(), dtype=np.int64)
+    id_ranks = np.fromiter(ranks.values(), dtype=np.int64)
+    order = np.argsort(ids)
+    ids, id_ranks = ids[order], id_ranks[order]
+    pos = np.clip(np.searchsorted(ids, figures.class_ids), 0, len(ids) - 1)
+    figure_ranks = np.where(ids[pos] == figures.class_ids, id_ranks[pos], no_rank)
+    image_ranks = np.minimum.reduceat(figure_ranks, figures.offsets[:-1])
+
+    img_ids = np.array([img.id for img in images], dtype=np.int64)
+    pos = np.clip(np.searchsorted(figures.image_ids, img_ids), 0, len(figures.image_ids) - 1)
+    found = figures.image_ids[pos] == img_ids
+    result[found] = image_ranks[pos[found]]
+    return result
+
+
+def tag_ranks(images: List[sly.ImageInfo], tag_metas: Sequence[sly.TagMeta]) -> np.ndarray:
+    """
+    Returns the position of the first tag (in project order) assigned to every image.
+    Images without any of the tags get ``len(tag_metas)``.
+    """
+    no_rank = len(tag_metas)
+    ranks = _meta_ranks(tag_metas)
+    return np.array(
+        [
+            min((ranks.get(tag["tagId"], no_rank) for tag in img.tags), default=no_rank)
+            for img in images
+        ],
+        dtype=np.int64,
+    )
+
+
+def group_by_ranks(images: List[sly.ImageInfo], ranks: np.ndarray, groups_count: int):
+    """
+    Places images into buckets by their rank in a single pass.
+    Order is the same as in the sequential grouping: groups follow project order,
+    images inside a group are in reversed order and ungrouped images keep their order at the end.
+    """
+    buckets = defaultdict(list)
+    for img, rank in zip(images, ranks.tolist()):
+        buckets[rank].append(img)
+    grouped_images = []
+    for rank in range(groups_count):
+        grouped_images.extend(reversed(buckets.get(rank, [])))
+    grouped_images.extend(buckets.get(groups_count, []))
+    return grouped_images
+
+
+def group_images(
+    images: List[sly.ImageInfo],
+    figures: FigureIndex,
+    group_by: str,
+    project_meta: sly.ProjectMeta,
+) -> List[sly.ImageInfo]:
+    """
+    Groups images by the first class or tag meta (in project order) they contain.
+
+    :param images: Images to group.
+    :type images: List[sly.ImageInfo]
+    :param figures: Light figures index of the images.
+    :type figures: FigureIndex
+    :param group_by: "class", "tag" or "none".
+    :type group_by: str
+    :param project_meta: Project meta that defines the order of groups.
+    :type project_meta: sly.ProjectMeta
+    :return: Grouped images.
+    :rtype: :class: `List[sly.ImageInfo]`
+    """
+    if group_by == "none":
+        return list(images)
+    elif group_by == "class":
+        metas = list(project_meta.obj_classes)
+        ranks = class_ranks(images, figures, metas)
+    elif group_by == "tag":
+        metas = list(project_meta.tag_metas)
+        ranks = tag_ranks(images, metas)
+    else:
+        raise NotImplementedError(f"Invalid group_by value: {group_by}")
+    return group_by_ranks(images, ranks, len(metas))
@@ -1,6 +1,8 @@
 import supervisely as sly
+from fastapi.responses import PlainTextResponse
 from supervisely.app.widgets import Container
 
+import src.globals as g
 import src.ui.control_panel as control_panel
 import src.ui.workbench as workbench
 from src.ui.apply_css.apply_style import ApplyCss
@@ -13,3 +15,9 @@ layout = Container(
 )
 
 app = sly.Application(layout=ApplyCss("./static/css/styles.css", layout), static_dir="static")
+
+
+@app.get_server().get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Timing spans and API latencies of the session in Prometheus text format."""
+    return PlainTextResponse(g.metrics.render(), media_type="text/plain; version=0.0.4")
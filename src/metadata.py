@@ -0,0 +1,73 @@
+import threading
+from typing import Callable, Hashable
+
+import supervisely as sly
+from cachetools import TTLCache
+from supervisely.api.labeling_job_api import LabelingJobInfo
+
+
+class MetadataCache:
+    """
+    Small TTL cache of job, dataset and project infos and job project meta,
+    shared by the UI handlers so switching between jobs reuses recently fetched metadata.
+
+    Call :meth:`invalidate_job`, :meth:`invalidate_dataset` or :meth:`clear`
+    whenever cached metadata is known to be changed.
+
+    :param api: Supervisely API instance.
+    :type api: sly.Api
+    :param ttl: Time in seconds cached entries are valid for.
+    :type ttl: int
+    """
+
+    def __init__(self, api: sly.Api, ttl: int = 300, maxsize: int = 256):
+        self._api = api
+        self._lock = threading.Lock()
+        self._job_infos = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._project_metas = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._dataset_infos = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._project_infos = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _get(self, cache: TTLCache, key: Hashable, fetch: Callable, refresh: bool):
+        if not refresh:
+            with self._lock:
+                value = cache.get(key)
+            if value is not None:
+                return value
+        value = fetch(key)
+        with self._lock:
+            cache[key] = value
+        return value
+
+    def job_info(self, job_id: int, refresh: bool = False) -> LabelingJobInfo:
+        return self._get(self._job_infos, job_id, self._api.labeling_job.get_info_by_id, refresh)
+
+    def project_meta(self, job_id: int, refresh: bool = False) -> sly.ProjectMeta:
+        return self._get(
+            self._project_metas, job_id, self._api.labeling_job.get_project_meta, refresh
+        )
+
+    def dataset_info(self, dataset_id: int, refresh: bool = False) -> sly.DatasetInfo:
+        return self._get(self._dataset_infos, dataset_id, self._api.dataset.get_info_by_id, refresh)
+
+    def project_info(self, project_id: int, refresh: bool = False) -> sly.ProjectInfo:
+        return self._get(self._project_infos, project_id, self._api.project.get_info_by_id, refresh)
+
+    def invalidate_job(self, job_id: int):
+        """Drops job info, e.g. after its entities were reviewed."""
+        with self._lock:
+            self._job_infos.pop(job_id, None)
+
+    def invalidate_dataset(self, dataset_id: int):
+        with self._lock:
+            self._dataset_infos.pop(dataset_id, None)
+
+    def clear(self):
+        with self._lock:
+            for cache in (
+                self._job_infos,
+                self._project_metas,
+                self._dataset_infos,
+                self._project_infos,
+            ):
+                cache.clear()
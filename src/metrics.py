@@ -0,0 +1,147 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import supervisely as sly
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+
+class Histogram:
+    """Histogram with labels and cumulative buckets, rendered in Prometheus text format."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per bucket counts, the last one is +Inf, sum of values)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[idx] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(
+                    f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    Timing spans of the review phases and API request latencies of the app session.
+    Metrics are exposed in Prometheus text format by :meth:`render`.
+    """
+
+    def __init__(self):
+        self.spans = Histogram(
+            "review_span_duration_seconds", "Duration of review phases.", ["span"]
+        )
+        self.span_errors = Counter(
+            "review_span_errors_total", "Number of review phases failed with an error.", ["span"]
+        )
+        self.api_requests = Histogram(
+            "review_api_request_duration_seconds", "Duration of API requests.", ["method"]
+        )
+        self.api_errors = Counter(
+            "review_api_request_errors_total", "Number of failed API requests.", ["method"]
+        )
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Measures the duration of the block as a named span and writes it to the debug log."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.span_errors.inc(span=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.spans.observe(elapsed, span=name)
+            sly.logger.debug(f"TIME to {name.replace('_', ' ')}: {elapsed:.3f} s")
+
+    def instrument_api(self, api: sly.Api) -> sly.Api:
+        """Wraps GET and POST requests of the API instance to record their latency by method."""
+        for attr in ("get", "post"):
+            request = getattr(api, attr)
+
+            def timed_request(*args, _request=request, **kwargs):
+                method = args[0] if args else kwargs.get("method")
+                start = time.perf_counter()
+                try:
+                    return _request(*args, **kwargs)
+                except Exception:
+                    self.api_errors.inc(method=method)
+                    raise
+                finally:
+                    self.api_requests.observe(time.perf_counter() - start, method=method)
+
+            setattr(api, attr, timed_request)
+        return api
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.spans, self.span_errors, self.api_requests, self.api_errors):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import supervisely as sly
+
+from src.batching import ImageBatches
+
+
+class AnnotationsPrefetcher:
+    """
+    Fetches and parses annotations of the upcoming image batches on a worker thread
+    while the current batch is being reviewed.
+
+    Only batches in range ``(current_idx, current_idx + depth]`` are kept in memory,
+    everything else is dropped on every :meth:`schedule` call.
+    Call :meth:`reset` whenever the review state (job, batches) is reset.
+
+    :param api_factory: Function returning an API instance owned by the calling thread.
+    :type api_factory: Callable[[], sly.Api]
+    :param depth: Number of batches to fetch ahead of the current one.
+    :type depth: int
+    """
+
+    def __init__(self, api_factory: Callable[[], sly.Api], depth: int = 2):
+        self._api_factory = api_factory
+        self._depth = depth
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._futures: Dict[int, Future] = {}
+        self._generation = 0
+        self._job_id = None
+        self._batches: Optional[ImageBatches] = None
+
+    def start(self, job_id: int, batches: ImageBatches):
+        """Resets previous state and binds the prefetcher to the new job batches."""
+        self.reset()
+        with self._lock:
+            self._job_id = job_id
+            self._batches = batches
+
+    def reset(self):
+        """Cancels pending fetches and drops all prefetched annotations."""
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+            self._job_id = None
+            self._batches = None
+
+    def schedule(self, current_idx: int):
+        """Starts fetching batches following ``current_idx`` and evicts the stale ones."""
+        with self._lock:
+            wanted = [
+                idx
+                for idx in range(current_idx + 1, current_idx + self._depth + 1)
+                if self._batches is not None and self._batches.exists(idx)
+            ]
+            for idx in list(self._futures.keys()):
+                if idx not in wanted:
+                    self._futures.pop(idx).cancel()
+            for idx in wanted:
+                if idx not in self._futures:
+                    self._futures[idx] = self._executor.submit(
+                        self._fetch, self._generation, self._job_id, self._batches[idx]
+                    )
+                    sly.logger.debug(f"Scheduled prefetch of batch {idx}")
+
+    def get(self, batch_idx: int) -> List[sly.Annotation]:
+        """
+        Returns annotations for the batch with the given index.
+        Waits for the prefetch if it is in progress, fetches synchronously otherwise.
+        """
+        with self._lock:
+            future = self._futures.pop(batch_idx, None)
+            job_id = self._job_id
+            batch = self._batches[batch_idx]
+        if future is not None:
+            try:
+                anns = future.result()
+                if anns is not None:
+                    sly.logger.debug(f"Annotations for batch {batch_idx} taken from prefetch")
+                    return anns
+            except CancelledError:
+                pass
+            except Exception as e:
+                sly.logger.warning(f"Prefetch of batch {batch_idx} failed, refetching: {repr(e)}")
+        return self._api_factory().labeling_job.get_annotations(job_id, image_infos=batch)
+
+    def _fetch(self, generation: int, job_id: int, batch: List[sly.ImageInfo]):
+        if generation != self._generation:
+            return None
+        anns = self._api_factory().labeling_job.get_annotations(job_id, image_infos=batch)
+        if generation != self._generation:
+            # state was reset while fetching, do not keep the result
+            return None
+        return anns
@@ -0,0 +1,109 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import supervisely as sly
+
+
+class HandlerProfiler:
+    """
+    Opt-in profiler of UI handlers wrapped by :func:`src.utils.handle_exception_dialog`.
+
+    Every call of a handler is profiled with cProfile while profiling is enabled.
+    Profiles of the ``keep`` slowest calls of every handler are dumped to the profiles directory
+    (open them with ``snakeviz`` or ``python -m pstats``) and a summary of their top functions
+    is written to the log. A handler called from another one is profiled separately,
+    its profile is merged into the profile of the outer handler.
+    When profiling is disabled, :meth:`run` only calls the handler.
+
+    :param enabled: Whether handlers are profiled.
+    :type enabled: bool
+    :param keep: Number of the slowest profiles kept for every handler.
+    :type keep: int
+    :param path: Directory for profile dumps, "profiles" in the app data dir by default.
+    :type path: str, optional
+    :param top: Number of functions in the logged summary.
+    :type top: int
+    """
+
+    def __init__(self, enabled: bool = False, keep: int = 5, path: str = None, top: int = 15):
+        self.enabled = enabled
+        self._keep = keep
+        self._path = path
+        self._top = top
+        self._session = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._slowest: Dict[str, List[Tuple[float, str]]] = {}  # handler -> (duration, file)
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Calls the handler and profiles the call if profiling is enabled."""
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        # cProfile can not run nested in the same thread, so the outer profile is paused
+        stack = getattr(self._thread_local, "stack", None)
+        if stack is None:
+            stack = self._thread_local.stack = []
+        outer = stack[-1] if stack else None
+        if outer is not None:
+            outer[0].disable()
+        profile = cProfile.Profile()
+        nested = []
+        stack.append((profile, nested))
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            duration = time.perf_counter() - start
+            stack.pop()
+            try:
+                # stats are collected before the outer profile is resumed,
+                # because disabling any profile stops profiling of the whole thread
+                self._record(func.__name__, duration, profile, nested)
+            finally:
+                if outer is not None:
+                    outer[1].append(profile)
+                    outer[1].extend(nested)
+                    outer[0].enable()
+
+    def _record(
+        self,
+        name: str,
+        duration: float,
+        profile: cProfile.Profile,
+        nested: List[cProfile.Profile],
+    ):
+        with self._lock:
+            slowest = self._slowest.setdefault(name, [])
+            if len(slowest) >= self._keep and duration <= slowest[0][0]:
+                sly.logger.debug(f"PROFILE {name}: {duration:.3f} s")
+                return
+            dump_dir = self._dump_dir()
+            filename = f"{name}_{datetime.now():%H%M%S%f}_{int(duration * 1000)}ms.prof"
+            stats = pstats.Stats(profile, *nested, stream=io.StringIO())
+            stats.dump_stats(os.path.join(dump_dir, filename))
+            slowest.append((duration, filename))
+            slowest.sort()
+            while len(slowest) > self._keep:
+                _, removed = slowest.pop(0)
+                sly.fs.silent_remove(os.path.join(dump_dir, removed))
+
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._top)
+        sly.logger.info(
+            f"PROFILE {name}: {duration:.3f} s, saved to {filename}\n{stats.stream.getvalue()}"
+        )
+
+    def _dump_dir(self) -> str:
+        if self._path is None:
+            self._path = os.path.join(sly.app.get_data_dir(), "profiles")
+        dump_dir = os.path.join(self._path, self._session)
+        os.makedirs(dump_dir, exist_ok=True)
+        return dump_dir
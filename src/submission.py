@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable
+
+import supervisely as sly
+
+
+@dataclass
+class SubmissionResult:
+    results: Dict[Hashable, Any] = field(default_factory=dict)
+    failed: Dict[Hashable, Exception] = field(default_factory=dict)
+
+
+def _call_with_retries(func: Callable[[], Any], retries: int, retry_sleep_sec: float):
+    for attempt in range(1, retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            sly.logger.debug(f"Request failed (attempt {attempt}/{retries}): {repr(e)}")
+            time.sleep(retry_sleep_sec * attempt)
+
+
+def submit_concurrently(
+    tasks: Dict[Hashable, Callable[[], Any]],
+    max_workers: int = 8,
+    retries: int = 3,
+    retry_sleep_sec: float = 0.5,
+) -> SubmissionResult:
+    """
+    Runs API requests over a bounded thread pool.
+    Every request is retried independently, failures are collected instead of being raised.
+
+    :param tasks: Dictionary where keys identify the request (e.g. image ID) and values are callables without arguments.
+    :type tasks: Dict[Hashable, Callable[[], Any]]
+    :param max_workers: Maximum number of requests running at the same time.
+    :type max_workers: int
+    :param retries: Number of attempts for every request.
+    :type retries: int
+    :param retry_sleep_sec: Base delay between attempts, grows linearly with the attempt number.
+    :type retry_sleep_sec: float
+    :return: Results of the succeeded requests and exceptions of the failed ones.
+    :rtype: :class: `SubmissionResult`
+    """
+    result = SubmissionResult()
+    if not tasks:
+        return result
+    workers = max(1, min(max_workers, len(tasks)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            key: executor.submit(_call_with_retries, func, retries, retry_sleep_sec)
+            for key, func in tasks.items()
+        }
+        for key, future in futures.items():
+            try:
+                result.results[key] = future.result()
+            except Exception as e:
+                result.failed[key] = e
+    return result
@@ -1,6 +1,8 @@
+import os
 import time
 from collections import defaultdict
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Tuple
 
 import supervisely as sly
 from supervisely.app.widgets import (
@@ -19,16 +21,21 @@ from supervisely.app.widgets import (
 )
 
 import src.globals as g
+import src.grouping as grouping
 import src.ui.workbench as workbench
 import src.utils as u
+from src.batching import BatchBudget, ImageBatches
+from src.cache import ReviewCache
+from src.figure_index import FigureIndex
+from src.filtering import ImageFilter
+from src.prefetch import AnnotationsPrefetcher
 
 
 @u.handle_exception_dialog
 def load_labeling_jobs():
     g.jobs_names = None
     g.labeling_jobs_list = None
-    filtered_projects = []
-    workspace_project_ids = defaultdict(list)
+    workspace_project_ids = defaultdict(set)
     g.labeling_jobs_list = g.api.labeling_job.get_list(
         team_id=sly.env.team_id(),
         reviewer_id=sly.env.user_id(),
@@ -36,18 +43,24 @@ def load_labeling_jobs():
         exclude_statuses=g.exclude_job_statuses,
     )
     # -------------------------- Filter Jobs With Projects Of "images" Type ------------------------- #
+    # project types never change, so only projects that are not cached yet are requested
     for job in g.labeling_jobs_list:
-        workspace_project_ids[job.workspace_id].append(job.project_id)
-    for workspace_id, project_ids in workspace_project_ids.items():
-        project_infos = g.api.project.get_list(
-            workspace_id=workspace_id,
-            filters=[{"field": "id", "operator": "in", "value": project_ids}],
-        )
-        for info in project_infos:
-            if info.type == "images":
-                filtered_projects.append(info.id)
+        if job.project_id not in g.project_types:
+            workspace_project_ids[job.workspace_id].add(job.project_id)
+    if workspace_project_ids:
+        workers = max(1, min(g.projects_fetch_workers, len(workspace_project_ids)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(u.list_projects_by_ids, workspace_id, list(project_ids))
+                for workspace_id, project_ids in workspace_project_ids.items()
+            ]
+            for future in as_completed(futures):
+                for info in future.result():
+                    g.project_types[info.id] = info.type
     filtered_jobs = [
-        job_info for job_info in g.labeling_jobs_list if job_info.project_id in filtered_projects
+        job_info
+        for job_info in g.labeling_jobs_list
+        if g.project_types.get(job_info.project_id) == "images"
     ]
     # ---------------------------------------- Update Globals ---------------------------------------- #
     g.labeling_jobs_list = filtered_jobs
@@ -155,16 +168,32 @@ batch_size_input = InputNumber(40, min=4, max=100)
 batch_size_text = Text(
     text="Set the number of images to be displayed in the batch", color="#5a6772"
 )
-batch_size_card = Card("Batch size", content=Container(widgets=[batch_size_text, batch_size_input]))
+adaptive_batch_size_switcher = Switch(False, on_text="Yes", off_text="No")
+adaptive_batch_size_text = Text(
+    text="Adapt the batch size to the number of objects on the images, so batches with many objects are smaller and are shown as fast as others. The number above becomes the maximum batch size",
+    color="#5a6772",
+)
+batch_size_card = Card(
+    "Batch size",
+    content=Container(
+        widgets=[
+            batch_size_text,
+            batch_size_input,
+            adaptive_batch_size_text,
+            adaptive_batch_size_switcher,
+        ]
+    ),
+)
 
 # --------------------------------------- Group By Settings -------------------------------------- #
 group_by_radio_group_items = [
     RadioGroup.Item(value="tag", label="Tags"),
     RadioGroup.Item(value="class", label="Classes"),
+    RadioGroup.Item(value="none", label="None"),
 ]
 group_by_radio_group = RadioGroup(items=group_by_radio_group_items, size="large")
 group_by_text = Text(
-    text="Images will be grouped by a specified criterion. If an image has multiple tags or classes, it will be placed in the group corresponding to the tag or class that was processed first in the grouping logic",
+    text="Images will be grouped by a specified criterion. If an image has multiple tags or classes, it will be placed in the group corresponding to the tag or class that was processed first in the grouping logic. Without grouping and filtering, the first batch is shown as soon as its images are loaded",
     color="#5a6772",
 )
 group_by_card = Card(
@@ -214,6 +243,22 @@ acceptance_radio_group_card = Card(
     title="Default decision",
 )
 
+# ----------------------------------------- Cache Settings --------------------------------------- #
+use_cache_switcher = Switch(True, on_text="Yes", off_text="No")
+use_cache_text = Text(
+    text="Keep the list of images and objects of the Labeling Job locally, so restarting the review with other settings does not download them again",
+    color="#5a6772",
+)
+use_cache_card = Card(
+    "Local cache",
+    content=Container(
+        widgets=[
+            use_cache_text,
+            use_cache_switcher,
+        ]
+    ),
+)
+
 # --------------------------------------- Settings Elements -------------------------------------- #
 settings_1st_line_container = Container(
     widgets=[batch_size_card, group_by_card],
@@ -228,8 +273,10 @@ settings_2nd_line_container = Container(
     fractions=[3, 2],
 )
 settings_3d_line_container = Container(
-    widgets=[acceptance_radio_group_card],
+    widgets=[acceptance_radio_group_card, use_cache_card],
     direction="horizontal",
+    style="flex: 3 2 0%;/* display: flex; */",
+    fractions=[3, 2],
 )
 settings_container = Container(
     widgets=[settings_1st_line_container, settings_2nd_line_container, settings_3d_line_container]
@@ -272,6 +319,7 @@ card = Card(
 def disable_settings(disable):
     if disable:
         batch_size_input.disable()
+        adaptive_batch_size_switcher.disable()
         group_by_radio_group.disable()
         job_tags_field.disable()
         job_classes_field.disable()
@@ -280,8 +328,10 @@ def disable_settings(disable):
         job_tags_selector.disable()
         job_classes_selector.disable()
         acceptance_radio_group.disable()
+        use_cache_switcher.disable()
     else:
         batch_size_input.enable()
+        adaptive_batch_size_switcher.enable()
         group_by_radio_group.enable()
         job_tags_field.enable()
         job_classes_field.enable()
@@ -290,25 +340,48 @@ def disable_settings(disable):
         job_tags_selector.enable()
         job_classes_selector.enable()
         acceptance_radio_group.enable()
+        use_cache_switcher.enable()
 
 
 @u.handle_exception_dialog
-def create_image_batches(img_infos: List[sly.ImageInfo], batch_size: int = 40):
-    batches = list(sly.batched(img_infos, batch_size=batch_size))
+def create_batch_budget(figures: FigureIndex = None) -> BatchBudget:
+    """Returns budget to cap batches by the number of figures if adaptive batch size is on."""
+    if not g.settings.adaptive_batch_size:
+        return None
+    return BatchBudget(
+        figures,
+        budget=g.batch_weight_budget,
+        target_s=g.batch_show_target_s,
+        image_weight=g.batch_image_weight,
+    )
+
+
+@u.handle_exception_dialog
+def create_image_batches(
+    img_infos: List[sly.ImageInfo], batch_size: int = 40, budget: BatchBudget = None
+):
+    batches = ImageBatches.from_list(img_infos, batch_size=batch_size, budget=budget)
     return batches
 
 
+def observe_batch(batch: List[sly.ImageInfo], seconds: float):
+    """Adapts the batch budget to the time of showing the batch if adaptive batch size is on."""
+    if g.image_batches.budget is not None:
+        g.image_batches.budget.observe(batch, seconds)
+
+
 @u.handle_exception_dialog
 def populate_gallery(gallery_widget: workbench.ReviewGallery):
-    start = time.time()
     gallery_widget.clean_up()
     batch = g.image_batches[g.current_batch_idx]
-    anns = g.api.labeling_job.get_annotations(g.job_info.id, image_infos=batch)
-    sly.logger.debug(f"TIME to get annotations: {time.time() - start}")
-    start = time.time()
-    for image, ann in zip(batch, anns):
-        gallery_widget.append(image, ann, project_meta=g.job_project_meta)
-    sly.logger.debug(f"TIME to populate gallery: {time.time() - start}")
+    start = time.perf_counter()
+    with g.metrics.span("get_annotations"):
+        anns = g.prefetcher.get(g.current_batch_idx)
+    with g.metrics.span("populate_gallery"):
+        gallery_widget.extend(batch, anns, project_meta=g.job_project_meta)
+    # observed before prefetching builds the next batch, so the adapted budget applies to it
+    observe_batch(batch, time.perf_counter() - start)
+    g.prefetcher.schedule(g.current_batch_idx)
 
 
 @u.handle_exception_dialog
@@ -323,88 +396,48 @@ def show_dialog_no_images():
 def get_settings():
     settings = g.Settings(
         batch_size=batch_size_input.value,
+        adaptive_batch_size=adaptive_batch_size_switcher.is_on(),
         group_by=group_by_radio_group.get_value(),
         tags=job_tags_selector.get_selected_tags(),
         classes=job_classes_selector.get_selected_classes(),
         filter_images=filter_images_switcher.is_on(),
         tags_editing=tags_editing_switcher.is_on(),
         default_decision=acceptance_radio_group.get_value(),
+        use_cache=use_cache_switcher.is_on(),
     )
     sly.logger.debug(f"Settings: {settings}")
     return settings
 
 
 @u.handle_exception_dialog
-def filter_images_by_tags(images: List[sly.ImageInfo], tags: List[str]):
-
-    filtered_images = []
-    tag_ids = [tag.sly_id for tag in tags]
-    for img in images:
-        if len(img.tags) == 0 and len(tags) == 0:
-            filtered_images.append(img)
-            continue
-        img_tag_ids = [tag["tagId"] for tag in img.tags]
-        if any(tag_id in tag_ids for tag_id in img_tag_ids):
-            filtered_images.append(img)
-    return filtered_images
+def filter_images_by_tags(images: List[sly.ImageInfo], tags: List[sly.TagMeta]):
+    image_filter = ImageFilter(images)
+    return image_filter.select(image_filter.has_tags([tag.sly_id for tag in tags]))
 
 
 @u.handle_exception_dialog
 def filter_image_by_class(
     img_infos: List[sly.ImageInfo],
-    figures_dict: Dict[int, List[sly.FigureInfo]],
+    figures_index: FigureIndex,
     settings: g.Settings,
 ):
     if not img_infos:
-        return [], []
-
-    filtered_figures = {}
-    filtered_img_ids = []
-    img_ids = [info.id for info in img_infos]
-    class_ids = [cls.sly_id for cls in settings.classes]
-    for id in img_ids:
-        figures = figures_dict.get(id, [])
-        if len(settings.classes) == 0 and len(figures) == 0:
-            filtered_figures[id] = figures
-            filtered_img_ids.append(id)
-            continue
-        elif len(settings.classes) > 0 and len(figures) > 0:
-            for figure in figures:
-                if figure.class_id in class_ids:
-                    filtered_figures[id] = figures
-                    filtered_img_ids.append(id)
-                    break
-    filtered_img_ids = set(filtered_img_ids)
-    filtered_imgs = [info for info in img_infos if info.id in filtered_img_ids]
-    return filtered_imgs, filtered_figures
+        return [], FigureIndex.from_arrays([])
+
+    image_filter = ImageFilter(img_infos, figures_index)
+    mask = image_filter.has_classes([cls.sly_id for cls in settings.classes])
+    filtered_imgs = image_filter.select(mask)
+    return filtered_imgs, figures_index.subset(image_filter.image_ids[mask])
 
 
 @u.handle_exception_dialog
 def group_images(
     images: List[sly.ImageInfo],
-    figures: Dict[int, List[sly.FigureInfo]],
+    figures: FigureIndex,
     group_by: str,
 ):
-    grouped_images: List[sly.ImageInfo] = []
     len_images = len(images)
-    if group_by == "class":
-        cond_func = lambda img, fig, cls: any(f.class_id == cls.sly_id for f in fig)
-        items = g.job_project_meta.obj_classes
-    elif group_by == "tag":
-        cond_func = lambda img, fig, tag: tag.sly_id in [tag["tagId"] for tag in img.tags]
-        items = g.job_project_meta.tag_metas
-    else:
-        raise NotImplementedError(f"Invalid group_by value: {group_by}")
-
-    for item in items:
-        for idx in range(len(images) - 1, -1, -1):
-            img = images[idx]
-            fig = figures.get(img.id, [])
-            if cond_func(img, fig, item):
-                grouped_images.append(img)
-                images.pop(idx)
-
-    grouped_images.extend(images)
+    grouped_images = grouping.group_images(images, figures, group_by, g.job_project_meta)
 
     if len_images != len(grouped_images):
         text = "Some images were not grouped."
@@ -413,8 +446,94 @@ def group_images(
     return grouped_images
 
 
+@u.handle_exception_dialog
+def load_review_images(images_filters: List[dict]) -> Tuple[List[sly.ImageInfo], FigureIndex]:
+    """
+    Loads all images for review at once, filters them by classes and groups them.
+    Returns the images with the index of all their figures,
+    or None instead of the index if all figures are not needed and were not loaded.
+    """
+    # the approximate number of images at which the dashbord will take more time to load
+    if g.job_ds_info.images_count >= 10000:
+        text = f"Datasets with {g.job_ds_info.images_count} images may take more time to load. Please wait."
+        sly.app.show_dialog("Processing...", text, "info")
+        sly.logger.info(text)
+
+    cache_version = None
+    if g.settings.use_cache:
+        # cache validation needs the latest job progress and dataset state
+        g.job_info = g.metadata.job_info(g.job_info.id, refresh=True)
+        g.job_ds_info = g.metadata.dataset_info(g.job_info.dataset_id, refresh=True)
+        cache_version = ReviewCache.version(g.job_info, g.job_ds_info)
+
+    with g.metrics.span("get_images"):
+        if cache_version is not None:
+            # only job filter is cached, tags are filtered locally
+            images = g.cache.get_images(g.job_info.id, cache_version)
+            if images is None:
+                job_filters = [f for f in images_filters if f["type"] == "job"]
+                images = g.api.image.get_filtered_list(g.job_info.dataset_id, filters=job_filters)
+                g.cache.put_images(g.job_info.id, cache_version, images)
+            # cached figures have to cover all images of the job, not only the filtered ones
+            scope_images = images
+            if g.settings.filter_images:
+                images = filter_images_by_tags(images, g.settings.tags)
+        else:
+            images = g.api.image.get_filtered_list(
+                g.job_info.dataset_id,
+                filters=images_filters,
+            )
+            scope_images = images
+
+    if not images:
+        return [], None
+
+    # all figures are needed to group by class and to find images without figures,
+    # otherwise only figures of the filtered classes are requested, or none at all
+    class_ids = [obj_class.sly_id for obj_class in g.settings.classes]
+    filter_classes = g.settings.filter_images
+    all_figures = g.settings.group_by == "class" or (filter_classes and not class_ids)
+    # figures are requested by image IDs if the images are only a part of the dataset
+    image_ids = None
+    if len(scope_images) < g.job_ds_info.images_count:
+        image_ids = [image.id for image in scope_images]
+    figures = None
+    if all_figures or filter_classes:
+        with g.metrics.span("get_figures"):
+            if cache_version is not None:
+                figures = g.cache.get_figures(g.job_info.id, cache_version)
+            if figures is None:
+                figures = u.list_light_figures_info(
+                    g.job_info.dataset_id,
+                    g.job_info.id,
+                    max_workers=g.figures_fetch_workers,
+                    class_ids=None if all_figures else class_ids,
+                    image_ids=image_ids,
+                    image_ids_chunk_size=g.figures_image_ids_chunk_size,
+                )
+                if cache_version is not None and all_figures:
+                    g.cache.put_figures(g.job_info.id, cache_version, figures)
+                elif not all_figures:
+                    sly.logger.debug(f"Loaded {len(figures)} figures of the filtered classes")
+
+    if filter_classes:
+        with g.metrics.span("filter_images"):
+            images, figures = filter_image_by_class(images, figures, g.settings)
+        if not images:
+            return [], None
+
+    with g.metrics.span("group_images"):
+        images = group_images(images, figures, g.settings.group_by)
+    return images, figures if all_figures else None
+
+
 disable_settings(True)
 g.populate_gallery_func = populate_gallery
+g.prefetcher = AnnotationsPrefetcher(u.get_thread_api, depth=g.prefetch_depth)
+g.cache = ReviewCache(
+    os.path.join(sly.app.get_data_dir(), "cache", "review_cache.sqlite3"),
+    max_size_mb=g.cache_max_size_mb,
+)
 
 
 # ---------------------------------------- Event Handlers --------------------------------------- #
@@ -437,12 +556,12 @@ def show_job_info(job_id):
     no_job_message.hide()
 
     g.selected_job = job_id
-    g.job_info = g.api.labeling_job.get_info_by_id(job_id)
+    g.job_info = g.metadata.job_info(job_id)
     selected_dataset = g.job_info.dataset_id
     selected_project = g.job_info.project_id
 
-    g.job_ds_info = g.api.dataset.get_info_by_id(selected_dataset)
-    dataset_thumbnail.set(g.api.project.get_info_by_id(selected_project), g.job_ds_info)
+    g.job_ds_info = g.metadata.dataset_info(selected_dataset)
+    dataset_thumbnail.set(g.metadata.project_info(selected_project), g.job_ds_info)
 
     cleaned_classes = [cls.strip("'") for cls in g.job_info.classes_to_label]
     cleaned_tags = [tag.strip("'") for tag in g.job_info.tags_to_label]
@@ -456,7 +575,7 @@ def show_job_info(job_id):
     job_info_widgets[6].text = f"Tags to label: {', '.join(cleaned_tags)}"
     job_info_widgets[7].text = f"Description: {g.job_info.description}"
 
-    g.job_project_meta = g.api.labeling_job.get_project_meta(g.selected_job)
+    g.job_project_meta = g.metadata.project_meta(g.selected_job)
     job_classes_selector.set(g.job_project_meta.obj_classes)
     job_tags_selector.set(g.job_project_meta.tag_metas)
 
@@ -474,6 +593,7 @@ def unlock_control_tab():
     job_selector.enable()
     start_review_button.show()
     g.change_settings_button.hide()
+    g.prefetcher.reset()
     g.image_gallery.clean_states()
     g.image_gallery.clean_up()
     workbench.card.lock()
@@ -503,8 +623,8 @@ def start_review():
     g.change_settings_button.show()
 
     sly.logger.debug(f"Calling API with Labeling Job ID {g.selected_job} to get dataset ID.")
-    g.job_info = g.api.labeling_job.get_info_by_id(g.selected_job)
-    g.job_project_meta = g.api.labeling_job.get_project_meta(g.selected_job)
+    g.job_info = g.metadata.job_info(g.selected_job)
+    g.job_project_meta = g.metadata.project_meta(g.selected_job)
     selected_dataset = g.job_info.dataset_id
     selected_project = g.job_info.project_id
 
@@ -549,55 +669,42 @@ def start_review():
             }
         )
 
-    # the approximate number of images at which the dashbord will take more time to load
-    if g.job_ds_info.images_count >= 10000:
-        text = f"Datasets with {g.job_ds_info.images_count} images may take more time to load. Please wait."
-        sly.app.show_dialog("Processing...", text, "info")
-        sly.logger.info(text)
-
-    start = time.time()
-    images = g.api.image.get_filtered_list(
-        g.job_info.dataset_id,
-        filters=images_filters,
-    )
-    sly.logger.debug(f"TIME to get images infos: {time.time() - start}")
-
-    if not images:
-        show_dialog_no_images()
-        return
-
-    start = time.time()
-    figures = u.list_light_figures_info(g.job_info.dataset_id)
-    sly.logger.debug(f"TIME to get light figures info: {time.time() - start}")
-
-    if g.settings.filter_images:
-        start = time.time()
-        images, figures = filter_image_by_class(images, figures, g.settings)
-        sly.logger.debug(f"TIME to filter annotations by class: {time.time() - start}")
+    if g.settings.group_by == "none" and not g.settings.filter_images:
+        # images are reviewed in the listing order, so batches are built page by page on demand
+        with g.metrics.span("get_images"):
+            g.review_images_cnt, pages = u.list_filtered_images_pages(
+                g.job_info.dataset_id, images_filters, per_page=g.images_page_size
+            )
+        if g.review_images_cnt == 0:
+            show_dialog_no_images()
+            return
+        # figures are not loaded in this mode, batches are weighted by labels count of the images
+        g.image_batches = ImageBatches(pages, g.settings.batch_size, create_batch_budget())
+    else:
+        images, figures = load_review_images(images_filters) or ([], None)
         if not images:
             show_dialog_no_images()
             return
-
-    start = time.time()
-    images = group_images(images, figures, g.settings.group_by)
-    sly.logger.debug(f"TIME to group images by {g.settings.group_by}: {time.time() - start}")
+        g.review_images_cnt = len(images)
+        g.image_batches = create_image_batches(
+            images, g.settings.batch_size, create_batch_budget(figures)
+        )
 
     # -------------------------------------- Adjust Progress Bar ------------------------------------- #
-    g.review_images_cnt = len(images)
     g.progress = workbench.review_progress(message="Reviewing images...", total=g.review_images_cnt)
 
-    g.image_batches = create_image_batches(images, g.settings.batch_size)
     g.image_gallery.set_default_review_state(g.settings.default_decision)
+    g.prefetcher.start(g.job_info.id, g.image_batches)
 
     # create image batch and get annotations only for it
-    start = time.time()
     batch = g.image_batches[g.current_batch_idx]
-    anns = g.api.labeling_job.get_annotations(g.job_info.id, image_infos=batch)
-    sly.logger.debug(f"TIME to get annotations: {time.time() - start}")
-    start = time.time()
-    for image, ann in zip(batch, anns):
-        g.image_gallery.append(image, ann, project_meta=g.job_project_meta)
-    sly.logger.debug(f"TIME to populate gallery: {time.time() - start}")
+    start = time.perf_counter()
+    with g.metrics.span("get_annotations"):
+        anns = g.prefetcher.get(g.current_batch_idx)
+    with g.metrics.span("populate_gallery"):
+        g.image_gallery.extend(batch, anns, project_meta=g.job_project_meta)
+    observe_batch(batch, time.perf_counter() - start)
+    g.prefetcher.schedule(g.current_batch_idx)
 
     workbench.card.unlock()
     workbench.card.uncollapse()
@@ -622,6 +729,8 @@ def show_filters(switched):
 def update_job_selector():
     refresh_button.icon = ""
     g.on_refresh = True
+    g.prefetcher.reset()
+    g.metadata.clear()
     g.image_gallery.clean_states()
     g.image_gallery.clean_up()
     load_labeling_jobs()
@@ -644,9 +753,24 @@ def set_tags_editing(switched):
 
 @u.handle_exception_dialog
 def finish_job():
+    job_id = g.job_info.id
+    if not g.decision_queue.join(job_id, timeout=g.decision_queue_finish_timeout):
+        text = "Review decisions are still being applied. Please wait and try again"
+        sly.app.show_dialog("Warning", text, "warning")
+        sly.logger.warning(text)
+        return
+    if g.decision_queue.counts(job_id)[1] > 0:
+        text = (
+            'Some review decisions failed to apply. Please click "Retry failed" '
+            'or "Discard failed" before completing the job'
+        )
+        sly.app.show_dialog("Warning", text, "warning")
+        sly.logger.warning(text)
+        return
     update_job_selector()
     unlock_control_tab()
-    g.api.labeling_job.set_status(g.job_info.id, "completed")
+    g.api.labeling_job.set_status(job_id, "completed")
+    g.metadata.invalidate_job(job_id)
 
 
 g.finish_cb = finish_job
@@ -0,0 +1,139 @@
+from typing import List, Literal
+
+import cv2
+import numpy as np
+from supervisely.geometry.bitmap import Bitmap
+
+SIMPLIFIED_GEOMETRIES = {"polygon": True, "line": False}  # geometry type -> closed contour
+
+
+def _simplify_points(points: List[List[int]], epsilon: float, closed: bool) -> List[List[int]]:
+    min_points = 3 if closed else 2
+    if len(points) <= min_points:
+        return points
+    contour = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+    approx = cv2.approxPolyDP(contour, epsilon, closed).reshape(-1, 2)
+    if len(approx) < min_points:
+        return points
+    return np.round(approx).astype(int).tolist()
+
+
+def simplify_figure(figure: dict, epsilon: float) -> dict:
+    """
+    Returns figure JSON with polygon or polyline points simplified by Douglas-Peucker algorithm.
+    Other geometries and figures are returned as is.
+
+    :param figure: Figure JSON as returned by :meth:`Label.to_json`.
+    :type figure: dict
+    :param epsilon: Maximum distance in image pixels between original and simplified contours.
+    :type epsilon: float
+    :return: Figure JSON for display.
+    :rtype: :class: `dict`
+    """
+    closed = SIMPLIFIED_GEOMETRIES.get(figure.get("geometryType"))
+    if closed is None or epsilon <= 0:
+        return figure
+    points = figure["points"]
+    simplified_points = {
+        "exterior": _simplify_points(points["exterior"], epsilon, closed),
+        "interior": [_simplify_points(ring, epsilon, True) for ring in points.get("interior", [])],
+    }
+    return {**figure, "points": simplified_points}
+
+
+def display_epsilon(image_width: int, cell_width: int, tolerance_px: float) -> float:
+    """
+    Converts tolerance in pixels of the rendered cell to image pixels.
+    Returns 0 if the image is not downscaled in the cell or tolerance is disabled.
+    """
+    if not tolerance_px or not image_width or not cell_width or image_width <= cell_width:
+        return 0
+    return tolerance_px * image_width / cell_width
+
+
+def reduce_mask(mask: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Returns mask reduced to every ``factor``-th pixel and scaled back to the original shape,
+    so it is drawn at the same place, but blocks of equal pixels make the encoded mask smaller.
+    """
+    height, width = mask.shape[:2]
+    reduced = mask[::factor, ::factor]
+    return np.repeat(np.repeat(reduced, factor, axis=0), factor, axis=1)[:height, :width]
+
+
+def mask_to_rle(mask: np.ndarray) -> List[int]:
+    """
+    Returns run lengths of the row-major flattened mask.
+    Runs alternate between background and foreground, starting with background.
+    """
+    flat = np.asarray(mask, dtype=bool).ravel()
+    if flat.size == 0:
+        return []
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.tolist()
+
+
+def rle_to_string(counts: List[int]) -> str:
+    """
+    Packs run lengths into a string the same way as COCO compressed RLE does:
+    every count is stored as a difference with the count two runs before,
+    split into 5-bit chunks encoded as printable characters.
+    """
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def display_bitmap(
+    figure: dict,
+    mask: np.ndarray,
+    factor: int = 1,
+    encoding: Literal["png", "rle"] = "png",
+) -> dict:
+    """
+    Returns figure JSON with bitmap mask prepared for display.
+
+    With ``factor`` of 2 or more the mask is reduced to the cell resolution.
+    With "rle" encoding the mask is sent as run lengths that are decoded by the gallery scripts
+    back to PNG data. Run lengths are used only when they are shorter than the original PNG data.
+
+    :param figure: Figure JSON as returned by :meth:`Label.to_json`.
+    :type figure: dict
+    :param mask: Mask of the figure, i.e. :attr:`Bitmap.data`.
+    :type mask: np.ndarray
+    :param factor: Number of image pixels in a rendered cell pixel.
+    :type factor: int
+    :param encoding: Encoding of the mask in the gallery payload.
+    :type encoding: str
+    :return: Figure JSON for display.
+    :rtype: :class: `dict`
+    """
+    if figure.get("geometryType") != "bitmap":
+        return figure
+    bitmap = figure["bitmap"]
+    # thin masks may vanish on reduction, they are kept in full resolution
+    if factor < 2 or not mask[::factor, ::factor].any():
+        factor = 1
+    if encoding == "rle":
+        # the reduced mask is sent as is and scaled back by the template
+        counts = rle_to_string(mask_to_rle(mask[::factor, ::factor]))
+        if len(counts) < len(bitmap["data"]):
+            rle = {"size": list(mask.shape[:2]), "factor": factor, "counts": counts}
+            return {**figure, "bitmap": {"origin": bitmap["origin"], "rle": rle}}
+    if factor > 1:
+        data = Bitmap.data_2_base64(reduce_mask(mask, factor))
+        return {**figure, "bitmap": {**bitmap, "data": data}}
+    return figure
@@ -1,8 +1,10 @@
-import copy
+import json
+import logging
+import threading
 import time
 import uuid
 from pathlib import Path
-from typing import Literal
+from typing import List, Literal
 
 import markupsafe
 import supervisely
@@ -11,23 +13,68 @@ from supervisely.app import DataJson
 from supervisely.app.content import StateJson
 from supervisely.app.jinja2 import create_env
 from supervisely.app.widgets import GridGallery
+from supervisely.app.widgets_context import JinjaWidgets
+
+from src.ui.review_gallery.display_geometry import (
+    display_bitmap,
+    display_epsilon,
+    simplify_figure,
+)
 
 
 class ReviewGallery(GridGallery):
+    class Routes(GridGallery.Routes):
+        CELLS_VISIBLE = "cells_visible_cb"
 
     def __init__(
         self,
         edit_tags: bool = False,
         default_review_state: Literal["accept", "reject", "ignore"] = "accept",
+        geometry_tolerance_px: float = 1.0,
+        cell_width_px: int = 300,
+        mask_encoding: Literal["png", "rle"] = "png",
+        lazy_figures: bool = False,
         *args,
         **kwargs,
     ):
+        # "rle" sends bitmap masks as run lengths decoded back to PNG by the gallery scripts,
+        # set before the base class serializes the widget data
+        self._mask_encoding = mask_encoding
         super().__init__(*args, **kwargs)
+        # figures are simplified to the resolution of the rendered cell,
+        # tolerance is in cell pixels, 0 disables simplification
+        self._geometry_tolerance_px = geometry_tolerance_px
+        self._cell_width_px = cell_width_px
+        self._full_geometry_cells = set()  # cells showing full resolution figures
+        # virtualized mode: cells are sent without figures, figures of a cell are sent
+        # when it is scrolled into view
+        self._lazy_figures = lazy_figures
+        self._loaded_cells = set()  # cells with figures sent in virtualized mode
+        self._lock = threading.RLock()  # cells are also updated from route handlers
+        self._full_figures_size = 0  # size of full figures JSON of new cells, measured on debug
         self._default_review_state = default_review_state
         self._edit_tags = edit_tags
-        self._review_states = {}  # states for active switchers
-        self._tag_values = {}  # values for active tags
+        self._review_states = {}  # default states for active switchers by image id
+        self._tag_values = {}  # original values for active tags by tag id
         self._tag_change_states = {}  # for fast checking if tag value was changed
+        self._task_meta = None  # project meta of the shown images
+        self._cells_cache = {}  # serialized cells by cell_uuid
+        self._cells_cache_meta = (
+            None  # project meta the cached cells and lookup tables were built with
+        )
+        self._class_colors = {}  # class title -> css color
+        self._tag_descriptors = {}  # tag meta id -> rendered tag without instance id and value
+        self._add_image_clicked_route()
+        if self._lazy_figures:
+            self._add_cells_visible_route()
+        # mask decoding and on-scroll loading, served from the static dir of the app
+        JinjaWidgets().context["__widget_scripts__"][self.__class__.__name__] = [
+            "./static/js/review_gallery/mask_decoder.js",
+            "./static/js/review_gallery/visibility.js",
+        ]
+
+    def get_json_data(self):
+        return {**super().get_json_data(), "maskEncoding": self._mask_encoding}
 
     def get_json_state(self):
         return {
@@ -50,6 +97,7 @@ class ReviewGallery(GridGallery):
             "tagValues": None,
             "tagChangeStates": None,
             "editTags": None,
+            "visibleCells": [],
         }
 
     def to_html(self):
@@ -79,7 +127,39 @@ class ReviewGallery(GridGallery):
     ):
 
         self._task_meta = project_meta
+        cell_uuid = self._add_cell(
+            image_info, annotation, title, column_index, zoom_to, zoom_factor, title_url
+        )
+        self._update()
+        return cell_uuid
+
+    def extend(
+        self,
+        image_infos: List[supervisely.ImageInfo],
+        annotations: List[supervisely.Annotation] = None,
+        project_meta: supervisely.ProjectMeta = None,
+    ) -> List[str]:
+        """Adds a whole batch of images to the gallery and syncs the widget once."""
+        self._task_meta = project_meta
+        if annotations is None:
+            annotations = [None] * len(image_infos)
+        cell_uuids = [
+            self._add_cell(image_info, annotation)
+            for image_info, annotation in zip(image_infos, annotations)
+        ]
+        self._update()
+        return cell_uuids
 
+    def _add_cell(
+        self,
+        image_info: supervisely.ImageInfo,
+        annotation: supervisely.Annotation = None,
+        title: str = "",
+        column_index: int = None,
+        zoom_to: int = None,
+        zoom_factor: float = 1.2,
+        title_url=None,
+    ) -> str:
         column_index = self.get_column_index(incoming_value=column_index)
         cell_uuid = str(
             uuid.uuid5(
@@ -107,77 +187,217 @@ class ReviewGallery(GridGallery):
                 "tags": image_info.tags,
             }
         )
-        self._review_states.update({image_info.id: self._default_review_state})
-        self._tag_values.update({tag["id"]: tag.get("value", None) for tag in image_info.tags})
-        self._update()
+        # keys are strings, as they come back from the client, so the state patches stay minimal
+        self._review_states.update({str(image_info.id): self._default_review_state})
+        self._tag_values.update({str(tag["id"]): tag.get("value", None) for tag in image_info.tags})
         return cell_uuid
 
     def _update(self):
-        self._update_layout()
-        self._update_project_meta()
-        self._update_annotations()
-        StateJson()[self.widget_id]["reviewStates"] = self._review_states
-        StateJson()[self.widget_id]["tagValues"] = self._tag_values
-        StateJson()[self.widget_id]["tagChangeStates"] = self._tag_change_states
+        with self._lock:
+            self._update_layout()
+            self._update_project_meta()
+            self._update_annotations()
         DataJson().send_changes()
-        StateJson().send_changes()
+        if self._sync_states():
+            StateJson().send_changes()
+
+    def _sync_states(self, reset: bool = False) -> bool:
+        """
+        Patches review states, tag values and tag change states in place instead of replacing them,
+        so only added (or removed and changed on reset) entries are sent to the client.
+        Values changed by the reviewer are kept unless ``reset`` is True.
+        Returns True if the state was changed.
+        """
+        state = StateJson()[self.widget_id]
+        changed = False
+        for key, values in (
+            ("reviewStates", self._review_states),
+            ("tagValues", self._tag_values),
+            ("tagChangeStates", self._tag_change_states),
+        ):
+            current = state.get(key)
+            if not isinstance(current, dict):
+                current = state[key] = {}
+                changed = True
+            if reset:
+                for stale_key in [k for k in current if k not in values]:
+                    del current[stale_key]
+                    changed = True
+            for k, v in values.items():
+                if k not in current or (reset and current[k] != v):
+                    current[k] = v
+                    changed = True
+        return changed
 
     def _update_annotations(self):
+        if self._cells_cache_meta is not self._task_meta:
+            self._cells_cache = {}
+            self._cells_cache_meta = self._task_meta
+            self._update_lookup_tables()
         annotations = {}
+        self._full_figures_size = 0
+        display_size = 0
+        measure = supervisely.logger.isEnabledFor(logging.DEBUG)
         for cell_data in self._data:
-            # ---------------------------------------- Prepare Classes --------------------------------------- #
-            figures = [label.to_json() for label in cell_data["annotation"].labels]
-            class_titles = list(set(figure["classTitle"] for figure in figures))
-            rgb_class_colors = [self._task_meta.get_obj_class(name).color for name in class_titles]
-            class_colors = [f"rgb({rgb[0]}, {rgb[1]}, {rgb[2]})" for rgb in rgb_class_colors]
-            classes_data = [
-                {"title": title, "color": color} for title, color in zip(class_titles, class_colors)
-            ]
-            # ----------------------------------------- Prepare Tags ----------------------------------------- #
-            img_tags = [
-                {"id": tag["id"], "tag_id": tag["tagId"], "value": tag.get("value", None)}
-                for tag in cell_data["tags"]
-            ]
+            cell_uuid = cell_data["cell_uuid"]
+            cell = self._cells_cache.get(cell_uuid)
+            if cell is None:
+                cell = self._build_cell(cell_data)
+                if measure:
+                    display_size += len(json.dumps(cell["figures"]))
+            annotations[cell_uuid] = cell
+        if self._full_figures_size > 0:
+            supervisely.logger.debug(
+                f"Figures payload of new cells: {self._full_figures_size / 1024:.1f} KiB "
+                f"of full geometry, {display_size / 1024:.1f} KiB sent for display"
+            )
+        # drop cells that are not in the gallery anymore
+        self._cells_cache = annotations
+        self._annotations = annotations
+        DataJson()[self.widget_id]["content"]["annotations"] = self._annotations
 
-            tags_data = []
-            for tag in img_tags:
-                tag_meta = self._task_meta.get_tag_meta_by_id(tag["tag_id"])
-                if not tag_meta:
-                    continue
-                tags_data.append(
-                    {
-                        "id": tag["id"],
-                        "title": tag_meta.name,
-                        "color": f"rgb({tag_meta.color[0]}, {tag_meta.color[1]}, {tag_meta.color[2]})",
-                        "value": tag["value"],
-                        "type": tag_meta.value_type,
-                        "options": (
-                            tag_meta.possible_values
-                            if tag_meta.value_type == "oneof_string"
-                            else None
-                        ),
-                    }
-                )
-            # -------------------------------------- Prepare Annotation -------------------------------------- #
-            annotations[cell_data["cell_uuid"]] = {
-                "uuid": cell_data["cell_uuid"],
-                "image_id": cell_data["image_id"],
-                "image_name": cell_data["image_name"],
-                "url": cell_data["image_url"],
-                "figures": [label.to_json() for label in cell_data["annotation"].labels],
-                "title": cell_data["title"],
-                "title_url": cell_data["title_url"],
-                "classes": classes_data,
-                "tags": tags_data,
+    def _update_lookup_tables(self):
+        self._class_colors = {}
+        self._tag_descriptors = {}
+        if self._task_meta is None:
+            return
+        for obj_class in self._task_meta.obj_classes:
+            rgb = obj_class.color
+            self._class_colors[obj_class.name] = f"rgb({rgb[0]}, {rgb[1]}, {rgb[2]})"
+        for tag_meta in self._task_meta.tag_metas:
+            self._tag_descriptors[tag_meta.sly_id] = {
+                "title": tag_meta.name,
+                "color": f"rgb({tag_meta.color[0]}, {tag_meta.color[1]}, {tag_meta.color[2]})",
+                "type": tag_meta.value_type,
+                "options": (
+                    tag_meta.possible_values if tag_meta.value_type == "oneof_string" else None
+                ),
             }
-            if not cell_data["zoom_to"] is None:
-                zoom_params = {
-                    "figureId": cell_data["zoom_to"],
-                    "factor": cell_data["zoom_factor"],
-                }
-                annotations[cell_data["cell_uuid"]]["zoomToFigure"] = zoom_params
-        self._annotations = copy.deepcopy(annotations)
-        DataJson()[self.widget_id]["content"]["annotations"] = self._annotations
+
+    def _build_cell(self, cell_data: dict) -> dict:
+        # ---------------------------------------- Prepare Classes --------------------------------------- #
+        lazy = self._lazy_figures and cell_data["cell_uuid"] not in self._loaded_cells
+        figures = [] if lazy else self._display_figures(cell_data)
+        annotation: supervisely.Annotation = cell_data["annotation"]
+        # classes are listed in stub cells too, the order is kept when figures are loaded
+        class_titles = list(dict.fromkeys(label.obj_class.name for label in annotation.labels))
+        classes_data = [
+            {"title": title, "color": self._class_colors.get(title)} for title in class_titles
+        ]
+        # ----------------------------------------- Prepare Tags ----------------------------------------- #
+        tags_data = []
+        for tag in cell_data["tags"]:
+            descriptor = self._tag_descriptors.get(tag["tagId"])
+            if descriptor is None:
+                continue
+            tags_data.append({**descriptor, "id": tag["id"], "value": tag.get("value", None)})
+        # -------------------------------------- Prepare Annotation -------------------------------------- #
+        cell = {
+            "uuid": cell_data["cell_uuid"],
+            "image_id": cell_data["image_id"],
+            "image_name": cell_data["image_name"],
+            "url": cell_data["image_url"],
+            "figures": figures,
+            "lazy": lazy,
+            "title": cell_data["title"],
+            "title_url": cell_data["title_url"],
+            "classes": classes_data,
+            "tags": tags_data,
+        }
+        if not cell_data["zoom_to"] is None:
+            cell["zoomToFigure"] = {
+                "figureId": cell_data["zoom_to"],
+                "factor": cell_data["zoom_factor"],
+            }
+        return cell
+
+    def _display_figures(self, cell_data: dict) -> List[dict]:
+        annotation: supervisely.Annotation = cell_data["annotation"]
+        epsilon = 0
+        if cell_data["cell_uuid"] not in self._full_geometry_cells:
+            epsilon = display_epsilon(
+                annotation.img_size[1], self._cell_width_px, self._geometry_tolerance_px
+            )
+        measure = supervisely.logger.isEnabledFor(logging.DEBUG)
+        display_figures = []
+        for label in annotation.labels:
+            figure = label.to_json()
+            if measure:
+                self._full_figures_size += len(json.dumps(figure))
+            if epsilon <= 0 and self._mask_encoding == "png":
+                display_figures.append(figure)
+                continue
+            try:
+                if isinstance(label.geometry, supervisely.Bitmap):
+                    figure = display_bitmap(
+                        figure, label.geometry.data, int(epsilon), self._mask_encoding
+                    )
+                else:
+                    figure = simplify_figure(figure, epsilon)
+            except Exception as e:
+                supervisely.logger.warning(
+                    f"Figure {figure.get('id')} is shown in full resolution: {repr(e)}"
+                )
+            display_figures.append(figure)
+        return display_figures
+
+    def show_full_geometry(self, cell_uuid: str):
+        """Resends figures of the cell in full resolution, e.g. when the cell is opened."""
+        with self._lock:
+            if cell_uuid in self._full_geometry_cells or cell_uuid not in self._cells_cache:
+                return
+            self._full_geometry_cells.add(cell_uuid)
+            self._loaded_cells.add(cell_uuid)
+            cell_data = next(c for c in self._data if c["cell_uuid"] == cell_uuid)
+            self._cells_cache[cell_uuid] = self._build_cell(cell_data)
+            self._update_annotations()
+        DataJson().send_changes()
+
+    def load_figures(self, cell_uuids: List[str]):
+        """
+        Sends figures of the cells that were sent without them in virtualized mode.
+        Cells that are not in the gallery anymore or already have figures are skipped.
+
+        :param cell_uuids: UUIDs of the cells scrolled into view.
+        :type cell_uuids: List[str]
+        """
+        with self._lock:
+            cell_uuids = [
+                cell_uuid
+                for cell_uuid in cell_uuids
+                if cell_uuid in self._cells_cache and cell_uuid not in self._loaded_cells
+            ]
+            if not cell_uuids:
+                return
+            self._loaded_cells.update(cell_uuids)
+            cells_data = {cell_data["cell_uuid"]: cell_data for cell_data in self._data}
+            for cell_uuid in cell_uuids:
+                self._cells_cache[cell_uuid] = self._build_cell(cells_data[cell_uuid])
+            self._update_annotations()
+        supervisely.logger.debug(f"Figures of {len(cell_uuids)} gallery cells are loaded")
+        DataJson().send_changes()
+
+    def _add_cells_visible_route(self):
+        route = ReviewGallery.Routes.CELLS_VISIBLE
+        server = self._sly_app.get_server()
+        DataJson()[self.widget_id].setdefault("widget_routes", {})[route] = "load_figures"
+
+        @server.post(self.get_route_path(route))
+        def _cells_visible():
+            self.load_figures(StateJson()[self.widget_id]["visibleCells"] or [])
+
+    def _add_image_clicked_route(self):
+        # figures of the clicked cell are switched to full resolution
+        route = GridGallery.Routes.IMAGE_CLICKED
+        server = self._sly_app.get_server()
+        DataJson()[self.widget_id].setdefault("widget_routes", {})[route] = "show_full_geometry"
+
+        @server.post(self.get_route_path(route))
+        def _image_clicked():
+            selected = StateJson()[self.widget_id]["selectedImage"]
+            cell_uuid = selected.get("uuid") if isinstance(selected, dict) else selected
+            if cell_uuid is not None:
+                self.show_full_geometry(cell_uuid)
 
     def get_review_states(self):
         return StateJson()[self.widget_id]["reviewStates"]
@@ -188,14 +408,27 @@ class ReviewGallery(GridGallery):
     def get_tag_change_states(self):
         return StateJson()[self.widget_id]["tagChangeStates"]
 
+    def get_changed_tag_values(self):
+        """Returns only tag values that differ from the original ones."""
+        return {
+            k: v
+            for k, v in self.get_tag_values().items()
+            if k in self._tag_values and self._tag_values[k] != v
+        }
+
     def set_default_review_state(self, state: Literal["accept", "reject", "ignore"]):
         self._default_review_state = state
 
+    def clean_up(self):
+        with self._lock:
+            self._cells_cache = {}
+            self._full_geometry_cells = set()
+            self._loaded_cells = set()
+            super().clean_up()
+
     def clean_states(self):
         self._review_states = {}
         self._tag_values = {}
         self._tag_change_states = {}
-        StateJson()[self.widget_id]["reviewStates"] = self._review_states
-        StateJson()[self.widget_id]["tagValues"] = self._tag_values
-        StateJson()[self.widget_id]["tagChangeStates"] = self._tag_change_states
-        StateJson().send_changes()
+        if self._sync_states(reset=True):
+            StateJson().send_changes()
@@ -1,8 +1,12 @@
+import os
+from typing import Any, Dict, List
+
 import supervisely as sly
 from supervisely.app.widgets import Button, Card, Container, Field, Progress, Text
 
 import src.globals as g
 import src.utils as u
+from src.decision_queue import DecisionQueue
 from src.ui.review_gallery.widget import ReviewGallery
 
 apply_button = Button("Apply to batch", "success")
@@ -30,6 +34,21 @@ finish_button_container = Container(
 finish_button_container.hide()
 finish_button.disable()
 
+queue_status_text = Text("", color="#5a6772")
+retry_failed_button = Button(
+    "Retry failed", "warning", button_size="small", icon="zmdi zmdi-refresh", plain=True
+)
+retry_failed_button.hide()
+discard_failed_button = Button(
+    "Discard failed", "danger", button_size="small", icon="zmdi zmdi-delete", plain=True
+)
+discard_failed_button.hide()
+queue_status_container = Container(
+    widgets=[queue_status_text, retry_failed_button, discard_failed_button],
+    direction="horizontal",
+    fractions=[["0 1 auto"], ["0 1 auto"], ["0 1 auto"]],
+)
+
 description_text = Text(
     "Displaying pictures in the gallery depends on grouping and filtering settings, allowing you to customize your viewing experience. \n"
     "Tag editing is possible if activated before starting the process. ",
@@ -38,10 +57,13 @@ description_text = Text(
 g.image_gallery = ReviewGallery(
     columns_number=4,
     empty_message="",
+    geometry_tolerance_px=g.geometry_tolerance_px,
+    mask_encoding=g.mask_encoding,
+    lazy_figures=g.lazy_figures,
 )
 review_progress = Progress()
 button_container = Container(
-    widgets=[apply_button_container, finish_button_container],
+    widgets=[queue_status_container, apply_button_container, finish_button_container],
     style="margin-top: 20px; align-items: flex-end;  border-top: 1px solid #5a6772; padding-top: 10px;",
 )
 gallery_container = Container(
@@ -59,6 +81,58 @@ card.lock()
 card.collapse()
 
 
+# ------------------------------------------- Functions ------------------------------------------ #
+
+
+def plan_tag_updates(
+    images: List[sly.ImageInfo],
+    review_states: dict,
+    changed_tag_values: dict,
+) -> Dict[int, Any]:
+    """
+    Returns a dictionary with pairs of tag ID and its new value.
+    Only changed tags of accepted images are included.
+    """
+    if not changed_tag_values:
+        return {}
+    accepted_tag_ids = {
+        str(tag["id"])
+        for image in images
+        if review_states.get(str(image.id)) == "accepted"
+        for tag in image.tags
+    }
+    return {
+        int(tag_id): value
+        for tag_id, value in changed_tag_values.items()
+        if tag_id in accepted_tag_ids
+    }
+
+
+def update_queue_status(pending: int, failed: int):
+    if pending == 0 and failed == 0:
+        queue_status_text.text = "All decisions are applied"
+    else:
+        queue_status_text.text = f"Decisions being applied: {pending}. Failed: {failed}"
+    if failed > 0:
+        retry_failed_button.show()
+        discard_failed_button.show()
+    else:
+        retry_failed_button.hide()
+        discard_failed_button.hide()
+
+
+g.decision_queue = DecisionQueue(
+    os.path.join(sly.app.get_data_dir(), "decisions", "journal.sqlite3"),
+    u.get_thread_api,
+    max_workers=g.submission_workers,
+    retries=g.submission_retries,
+    metrics=g.metrics,
+)
+g.decision_queue.add_listener(update_queue_status)
+update_queue_status(*g.decision_queue.counts())
+g.decision_queue.start()
+
+
 # ---------------------------------------- Event Handlers ---------------------------------------- #
 
 
@@ -67,8 +141,8 @@ card.collapse()
 def apply_decision():
     g.change_settings_button.disable()
     review_states: dict = g.image_gallery.get_review_states()
-    tag_values: dict = g.image_gallery.get_tag_values()
-    tag_change_states: dict = g.image_gallery.get_tag_change_states()
+    changed_tag_values: dict = g.image_gallery.get_changed_tag_values()
+    review_statuses = {}
     for image in g.image_batches[g.current_batch_idx]:
         try:
             review_state = review_states[str(image.id)]
@@ -82,23 +156,22 @@ def apply_decision():
             continue
         if review_state == "ignore":
             continue
-        elif review_state == "accepted":
-            changed_tag_ids = list(tag_change_states.keys())
-            for tag_id in changed_tag_ids:
-                if any(d.get("id") == int(tag_id) for d in image.tags):
-                    respones = g.api.image.update_tag_value(int(tag_id), value=tag_values[tag_id])
-                    if respones.get("success", False):
-                        sly.logger.info(f"Tag {tag_id} updated successfully")
-                    else:
-                        sly.logger.error(f"Error in updating tag {tag_id}")
-        g.api.labeling_job.set_entity_review_status(
-            g.job_info.id,
-            image.id,
-            review_state,
-        )
+        review_statuses[image.id] = review_state
+
+    tag_updates = plan_tag_updates(
+        g.image_batches[g.current_batch_idx],
+        review_states,
+        changed_tag_values,
+    )
+    # decisions are sent to the API in background, so the next batch is shown right away
+    with g.metrics.span("apply_decisions"):
+        g.decision_queue.put(g.job_info.id, review_statuses, tag_updates)
+    g.metadata.invalidate_job(g.job_info.id)
+    if tag_updates:
+        g.metadata.invalidate_dataset(g.job_info.dataset_id)
 
     g.progress.update(len(g.image_batches[g.current_batch_idx]))
-    if g.current_batch_idx < len(g.image_batches) - 1:
+    if g.image_batches.exists(g.current_batch_idx + 1):
         g.current_batch_idx += 1
         g.image_gallery.clean_states()
         g.populate_gallery_func(g.image_gallery)
@@ -118,6 +191,18 @@ def apply_decision():
     g.change_settings_button.enable()
 
 
+@retry_failed_button.click
+@u.handle_exception_dialog
+def retry_failed_decisions():
+    g.decision_queue.retry_failed()
+
+
+@discard_failed_button.click
+@u.handle_exception_dialog
+def discard_failed_decisions():
+    g.decision_queue.discard_failed()
+
+
 @finish_button.click
 def finish_review():
     g.on_complete = True
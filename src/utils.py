@@ -1,17 +1,19 @@
-from collections import defaultdict
-from typing import Dict, List
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Tuple
 
+import numpy as np
 import supervisely as sly
 from supervisely.api.api import ApiField
-from supervisely.api.entity_annotation.figure_api import FigureApi
 
 import src.globals as g
+from src.figure_index import FigureIndex
 
 
 def handle_exception_dialog(func):
     def wrapper(*args, **kwargs):
         try:
-            return func(*args, **kwargs)
+            return g.profiler.run(func, *args, **kwargs)
         except Exception as e:
             title = type(e).__name__
             descr = f'Error occured in "{func.__name__}" function. Description: {str(e)}'
@@ -21,19 +23,82 @@ def handle_exception_dialog(func):
     return wrapper
 
 
+_thread_local = threading.local()
+
+
+def get_thread_api() -> sly.Api:
+    """
+    Returns an API instance owned by the calling thread.
+    Use it in worker threads and whenever request headers (e.g. "x-job-id") have to be changed,
+    so the shared ``g.api`` headers are never modified concurrently.
+    """
+    api = getattr(_thread_local, "api", None)
+    if api is None:
+        api = g.metrics.instrument_api(sly.Api.from_env())
+        _thread_local.api = api
+    return api
+
+
+def list_projects_by_ids(workspace_id: int, project_ids: List[int]) -> List[sly.ProjectInfo]:
+    """Returns infos of the projects with given IDs in the workspace. Safe to call from worker threads."""
+    return get_thread_api().project.get_list(
+        workspace_id=workspace_id,
+        filters=[{"field": "id", "operator": "in", "value": project_ids}],
+    )
+
+
+def _post_as_job(method: str, data: dict, job_id: int = None) -> dict:
+    api = get_thread_api()
+    if job_id is None:
+        return api.post(method, data).json()
+    api.add_header("x-job-id", str(job_id))
+    try:
+        return api.post(method, data).json()
+    finally:
+        api.pop_header("x-job-id")
+
+
+def _list_figures_chunk(data: dict, job_id: int = None) -> List[np.ndarray]:
+    """Returns all pages of the "figures.list" request as arrays, pages are fetched one by one."""
+    infos = _post_as_job("figures.list", data, job_id)
+    pages = [FigureIndex.entities_to_array(infos["entities"])]
+    for page in range(2, infos["pagesCount"] + 1):
+        infos = _post_as_job("figures.list", {**data, ApiField.PAGE: page}, job_id)
+        pages.append(FigureIndex.entities_to_array(infos["entities"]))
+    return pages
+
+
 def list_light_figures_info(
     dataset_id: int,
-) -> Dict[int, List[sly.FigureInfo]]:
+    job_id: int = None,
+    max_workers: int = 4,
+    class_ids: List[int] = None,
+    image_ids: List[int] = None,
+    image_ids_chunk_size: int = 500,
+) -> FigureIndex:
     """
-    Method returns a dictionary with pairs of image ID and list of FigureInfo for the given dataset ID.
-    This FigureInfo does not contain geometry information.
+    Method returns a columnar index of light figures for the given dataset ID.
+    The index does not contain geometry information.
     Conntains only image ID, class ID and figure ID.
     Use it only for filtering and sorting purposes.
+    Pages after the first one are fetched concurrently.
+    If ``image_ids`` are provided, figures are requested by chunks of image IDs,
+    chunks are fetched concurrently.
 
     :param dataset_id: Dataset ID in Supervisely.
     :type dataset_id: int
-    :return: A dictionary where keys are image IDs and values are lists of FigureInfo.
-    :rtype: :class: `Dict[int, List[FigureInfo]]`
+    :param job_id: Labeling Job ID in Supervisely, sent as "x-job-id" header if provided.
+    :type job_id: int, optional
+    :param max_workers: Maximum number of pages fetched at the same time.
+    :type max_workers: int
+    :param class_ids: Only figures of these classes are requested if provided.
+    :type class_ids: List[int], optional
+    :param image_ids: Only figures of these images are requested if provided.
+    :type image_ids: List[int], optional
+    :param image_ids_chunk_size: Number of image IDs in a single request.
+    :type image_ids_chunk_size: int
+    :return: Index of figures grouped by image ID.
+    :rtype: :class: `FigureIndex`
     """
     fields = ["id", "imageId", "classId"]
     data = {
@@ -41,22 +106,94 @@ def list_light_figures_info(
         ApiField.FIELDS: fields,
         ApiField.FILTER: [],
     }
-    if g.api.headers.get("x-job-id") != str(id):
-        g.api.add_header("x-job-id", str(id))
-    resp = g.api.post("figures.list", data)
-    infos = resp.json()
-    images_figures = defaultdict(list)
+    if class_ids is not None:
+        data[ApiField.FILTER].append(
+            {ApiField.FIELD: ApiField.CLASS_ID, "operator": "in", ApiField.VALUE: class_ids}
+        )
+
+    if image_ids is not None:
+        image_ids = sorted(set(image_ids))
+        chunks_data = [
+            {
+                **data,
+                ApiField.FILTER: data[ApiField.FILTER]
+                + [
+                    {
+                        ApiField.FIELD: ApiField.ENTITY_ID,
+                        "operator": "in",
+                        ApiField.VALUE: image_ids[i : i + image_ids_chunk_size],
+                    }
+                ],
+            }
+            for i in range(0, len(image_ids), image_ids_chunk_size)
+        ]
+        pages = []
+        if chunks_data:
+            workers = max(1, min(max_workers, len(chunks_data)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_list_figures_chunk, chunk_data, job_id)
+                    for chunk_data in chunks_data
+                ]
+                for future in as_completed(futures):
+                    pages.extend(future.result())
+        return FigureIndex.from_arrays(pages)
+
+    infos = _post_as_job("figures.list", data, job_id)
     total_pages = infos["pagesCount"]
-    for page in range(1, total_pages + 1):
-        if page > 1:
-            data.update({ApiField.PAGE: page})
-            resp = g.api.post("figures.list", data)
-            infos = resp.json()
-        for info in infos["entities"]:
-            figure_info = g.api.image.figure._convert_json_info(info, True)
-            images_figures[figure_info.entity_id].append(figure_info)
-
-    if g.api.headers.get("x-job-id") == str(id):
-        g.api.pop_header("x-job-id")
-
-    return dict(images_figures)
+    pages = [FigureIndex.entities_to_array(infos["entities"])]
+    if total_pages > 1:
+        pages_data = [{**data, ApiField.PAGE: page} for page in range(2, total_pages + 1)]
+        workers = max(1, min(max_workers, len(pages_data)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_post_as_job, "figures.list", page_data, job_id)
+                for page_data in pages_data
+            ]
+            for future in as_completed(futures):
+                pages.append(FigureIndex.entities_to_array(future.result()["entities"]))
+
+    return FigureIndex.from_arrays(pages)
+
+
+def list_filtered_images_pages(
+    dataset_id: int,
+    filters: List[dict],
+    per_page: int = 1000,
+) -> Tuple[int, Iterator[List[sly.ImageInfo]]]:
+    """
+    Method returns the total number of images matching the filters and an iterator over pages of them.
+    Only the first page is requested immediately, the next ones are requested while iterating.
+    Pages are requested by key (images with ID greater than the last listed one), not by offset,
+    because images reviewed while iterating drop out of the job filter and would shift the offsets.
+
+    :param dataset_id: Dataset ID in Supervisely.
+    :type dataset_id: int
+    :param filters: Filters in the format of :meth:`ImageApi.get_filtered_list`.
+    :type filters: List[dict]
+    :param per_page: Number of images in every page.
+    :type per_page: int
+    :return: Total number of images and iterator over pages of ImageInfo.
+    :rtype: :class: `Tuple[int, Iterator[List[ImageInfo]]]`
+    """
+    data = {
+        ApiField.DATASET_ID: dataset_id,
+        ApiField.FILTERS: filters,
+        ApiField.SORT: "id",
+        ApiField.SORT_ORDER: "asc",
+        ApiField.FORCE_METADATA_FOR_LINKS: True,
+        ApiField.PER_PAGE: per_page,
+    }
+    first_response = g.api.post("images.list", data).json()
+
+    def _pages():
+        response = first_response
+        while len(response["entities"]) > 0:
+            yield [g.api.image._convert_json_info(info) for info in response["entities"]]
+            if response["pagesCount"] <= 1:
+                return
+            last_id = response["entities"][-1][ApiField.ID]
+            after_last = [{ApiField.FIELD: ApiField.ID, "operator": ">", ApiField.VALUE: last_id}]
+            response = g.api.post("images.list", {**data, ApiField.FILTER: after_last}).json()
+
+    return first_response["total"], _pages()
@@ -0,0 +1,302 @@
+// Decodes bitmap masks sent as run lengths back to the Supervisely bitmap format:
+// base64 of zlib compressed 1-bit palette PNG, the same format the SDK encodes masks in.
+// Masks are compressed with CompressionStream asynchronously, figures of a mask are shown
+// once it is decoded. Without CompressionStream deflate blocks are stored uncompressed.
+// Templates call it as "reviewGalleryDecodeMasks" method, added to every Vue instance.
+(function () {
+  if (window.reviewGalleryMaskDecoder) {
+    return;
+  }
+  window.reviewGalleryMaskDecoder = true;
+
+  var CRC_TABLE = new Uint32Array(256);
+  for (var n = 0; n < 256; n++) {
+    var c = n;
+    for (var k = 0; k < 8; k++) {
+      c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+    }
+    CRC_TABLE[n] = c >>> 0;
+  }
+
+  function crc32(bytes) {
+    var crc = 0xffffffff;
+    for (var i = 0; i < bytes.length; i++) {
+      crc = CRC_TABLE[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xffffffff) >>> 0;
+  }
+
+  function adler32(bytes) {
+    var a = 1;
+    var b = 0;
+    for (var i = 0; i < bytes.length; i++) {
+      a = (a + bytes[i]) % 65521;
+      b = (b + a) % 65521;
+    }
+    return ((b << 16) | a) >>> 0;
+  }
+
+  function writeUint32(out, pos, value) {
+    out[pos] = value >>> 24;
+    out[pos + 1] = (value >>> 16) & 0xff;
+    out[pos + 2] = (value >>> 8) & 0xff;
+    out[pos + 3] = value & 0xff;
+  }
+
+  function zlibStored(raw) {
+    var blocks = Math.max(1, Math.ceil(raw.length / 65535));
+    var out = new Uint8Array(2 + raw.length + blocks * 5 + 4);
+    out[0] = 0x78;
+    out[1] = 0x01;
+    var pos = 2;
+    for (var i = 0; i < blocks; i++) {
+      var start = i * 65535;
+      var len = Math.min(65535, raw.length - start);
+      out[pos++] = i === blocks - 1 ? 1 : 0;
+      out[pos++] = len & 0xff;
+      out[pos++] = len >>> 8;
+      out[pos++] = ~len & 0xff;
+      out[pos++] = (~len >>> 8) & 0xff;
+      out.set(raw.subarray(start, start + len), pos);
+      pos += len;
+    }
+    writeUint32(out, pos, adler32(raw));
+    return out;
+  }
+
+  function pngChunk(type, data) {
+    var body = new Uint8Array(4 + data.length);
+    for (var i = 0; i < 4; i++) {
+      body[i] = type.charCodeAt(i);
+    }
+    body.set(data, 4);
+    var chunk = new Uint8Array(body.length + 8);
+    writeUint32(chunk, 0, data.length);
+    chunk.set(body, 4);
+    writeUint32(chunk, body.length + 4, crc32(body));
+    return chunk;
+  }
+
+  function concat(arrays) {
+    var total = arrays.reduce(function (sum, a) { return sum + a.length; }, 0);
+    var out = new Uint8Array(total);
+    var pos = 0;
+    arrays.forEach(function (a) {
+      out.set(a, pos);
+      pos += a.length;
+    });
+    return out;
+  }
+
+  function toBase64(bytes) {
+    var parts = [];
+    for (var i = 0; i < bytes.length; i += 0x8000) {
+      parts.push(String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000)));
+    }
+    return btoa(parts.join(""));
+  }
+
+  // reverse of COCO compressed RLE: 5-bit chunks, counts are stored as deltas
+  function stringToRle(s) {
+    var counts = [];
+    var p = 0;
+    while (p < s.length) {
+      var x = 0;
+      var k = 0;
+      var more = true;
+      while (more) {
+        var c = s.charCodeAt(p) - 48;
+        x |= (c & 0x1f) << (5 * k);
+        more = (c & 0x20) !== 0;
+        p++;
+        k++;
+        if (!more && c & 0x10) {
+          x |= -1 << (5 * k);
+        }
+      }
+      if (counts.length > 2) {
+        x += counts[counts.length - 2];
+      }
+      counts.push(x);
+    }
+    return counts;
+  }
+
+  // resolves to zlib stream of the bytes
+  function zlibCompress(bytes) {
+    if (!window.CompressionStream) {
+      return Promise.resolve(zlibStored(bytes));
+    }
+    var stream = new Blob([bytes]).stream().pipeThrough(new CompressionStream("deflate"));
+    return new Response(stream).arrayBuffer().then(function (buffer) {
+      return new Uint8Array(buffer);
+    });
+  }
+
+  // rows of 1-bit pixels, every row starts with the "none" filter byte
+  function packRows(rle) {
+    var height = rle.size[0];
+    var width = rle.size[1];
+    var counts = stringToRle(rle.counts);
+    // masks reduced to the cell resolution are sent with every factor-th pixel
+    var factor = rle.factor || 1;
+    var reducedWidth = Math.ceil(width / factor);
+    var reduced = new Uint8Array(Math.ceil(height / factor) * reducedWidth);
+    var pixel = 0;
+    for (var i = 0; i < counts.length; i++) {
+      if (i % 2 === 1) {
+        reduced.fill(1, pixel, pixel + counts[i]);
+      }
+      pixel += counts[i];
+    }
+    var rowLength = Math.ceil(width / 8) + 1;
+    var raw = new Uint8Array(height * rowLength);
+    for (var y = 0; y < height; y++) {
+      var offset = y * rowLength;
+      if (y % factor !== 0) {
+        // rows of the reduced mask are repeated factor times
+        raw.copyWithin(offset, offset - rowLength, offset);
+        continue;
+      }
+      var rowStart = (y / factor) * reducedWidth;
+      for (var x = 0; x < width; x++) {
+        if (reduced[rowStart + Math.floor(x / factor)]) {
+          raw[offset + 1 + (x >> 3)] |= 0x80 >> (x & 7);
+        }
+      }
+    }
+    return raw;
+  }
+
+  // resolves to the bitmap data of the mask
+  function rleToBitmapData(rle) {
+    var header = new Uint8Array(13);
+    writeUint32(header, 0, rle.size[1]);
+    writeUint32(header, 4, rle.size[0]);
+    header[8] = 1; // bit depth
+    header[9] = 3; // palette color type
+    return zlibCompress(packRows(rle))
+      .then(function (idat) {
+        return zlibCompress(
+          concat([
+            new Uint8Array([0x89, 0x50, 0x4e, 0x47, 0x0d, 0x0a, 0x1a, 0x0a]),
+            pngChunk("IHDR", header),
+            pngChunk("PLTE", new Uint8Array([0, 0, 0, 255, 255, 255])),
+            pngChunk("tRNS", new Uint8Array([0])),
+            pngChunk("IDAT", idat),
+            pngChunk("IEND", new Uint8Array(0)),
+          ])
+        );
+      })
+      .then(toBase64);
+  }
+
+  var decodedMasks = new WeakMap(); // rle -> bitmap data, null while decoding, false on error
+  // decoded masks counter, the gallery is rendered again when it changes
+  var decoding = Vue.observable({ done: 0 });
+  var decodedCells = new WeakMap();
+  var lastResult = null;
+
+  function maskKey(figure) {
+    return figure.bitmap && figure.bitmap.rle ? figure.bitmap.rle.counts : null;
+  }
+
+  function bitmapData(rle) {
+    if (!decodedMasks.has(rle)) {
+      decodedMasks.set(rle, null);
+      rleToBitmapData(rle).then(
+        function (data) {
+          decodedMasks.set(rle, data);
+          decoding.done++;
+        },
+        function (error) {
+          decodedMasks.set(rle, false);
+          console.error("Failed to decode bitmap mask", error);
+        }
+      );
+    }
+    return decodedMasks.get(rle);
+  }
+
+  // cells may be patched in place, so cached cells are checked against the source figures
+  function isActual(cached, cell) {
+    return (
+      cached.figures === cell.figures &&
+      cached.sources.length === cell.figures.length &&
+      cached.sources.every(function (source, i) {
+        return source.figure === cell.figures[i] && source.key === maskKey(cell.figures[i]);
+      })
+    );
+  }
+
+  function decodeCell(cell) {
+    if (!cell.figures || !cell.figures.some(maskKey)) {
+      return cell;
+    }
+    var cached = decodedCells.get(cell);
+    var actual = cached !== undefined && isActual(cached, cell);
+    // cells with masks being decoded are checked again when any mask is decoded
+    if (actual && (!cached.pending || cached.checkedAt === decoding.done)) {
+      return cached.decoded;
+    }
+    var pending = false;
+    var figures = [];
+    cell.figures.forEach(function (figure) {
+      if (!maskKey(figure)) {
+        figures.push(figure);
+        return;
+      }
+      var data = bitmapData(figure.bitmap.rle);
+      if (data === null) {
+        pending = true;
+      } else if (data) {
+        figures.push(
+          Object.assign({}, figure, { bitmap: { origin: figure.bitmap.origin, data: data } })
+        );
+      }
+    });
+    if (actual && cached.figuresCount === figures.length) {
+      // none of the masks of the cell was decoded since the last check
+      cached.pending = pending;
+      cached.checkedAt = decoding.done;
+      return cached.decoded;
+    }
+    cached = {
+      figures: cell.figures,
+      sources: cell.figures.map(function (figure) {
+        return { figure: figure, key: maskKey(figure) };
+      }),
+      figuresCount: figures.length,
+      pending: pending,
+      checkedAt: decoding.done,
+      decoded: Object.assign({}, cell, { figures: figures }),
+    };
+    decodedCells.set(cell, cached);
+    return cached.decoded;
+  }
+
+  // returns the same object while decoded cells are not changed, so the gallery is not redrawn
+  function decodeMasks(content) {
+    void decoding.done; // rendered again when masks are decoded
+    var annotations = {};
+    var keys = Object.keys(content.annotations);
+    var same = lastResult !== null && lastResult.source === content;
+    same = same && lastResult.value.layout === content.layout;
+    same = same && lastResult.value.projectMeta === content.projectMeta;
+    same = same && Object.keys(lastResult.value.annotations).length === keys.length;
+    keys.forEach(function (key) {
+      annotations[key] = decodeCell(content.annotations[key]);
+      same = same && lastResult.value.annotations[key] === annotations[key];
+    });
+    if (!same) {
+      lastResult = {
+        source: content,
+        value: Object.assign({}, content, { annotations: annotations }),
+      };
+    }
+    return lastResult.value;
+  }
+
+  // Vue 2 templates resolve only instance members and whitelisted globals
+  Vue.prototype.reviewGalleryDecodeMasks = decodeMasks;
+})();
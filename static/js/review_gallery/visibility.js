@@ -0,0 +1,93 @@
+// Registers "v-review-gallery-visible" directive used by the gallery in virtualized mode.
+// Binding value is { widget, uuid, load } for cells shown without figures and null for others.
+// When cells come close to the viewport, their UUIDs are passed to "load" in a single call.
+(function () {
+  if (window.reviewGalleryVisibility) {
+    return;
+  }
+  window.reviewGalleryVisibility = true;
+
+  var FLUSH_DELAY_MS = 100;
+  var pending = [];
+  var requested = new Set(); // cells are requested once, even if they are redrawn before loading
+  var timer = null;
+
+  function flush() {
+    timer = null;
+    var batches = new Map(); // widget ID -> load callback and cell UUIDs
+    pending.forEach(function (binding) {
+      if (!batches.has(binding.widget)) {
+        batches.set(binding.widget, { load: binding.load, uuids: [] });
+      }
+      batches.get(binding.widget).uuids.push(binding.uuid);
+    });
+    pending = [];
+    batches.forEach(function (batch) {
+      batch.load(batch.uuids);
+    });
+  }
+
+  function enqueue(binding) {
+    if (requested.has(binding.uuid)) {
+      return;
+    }
+    requested.add(binding.uuid);
+    pending.push(binding);
+    if (timer === null) {
+      timer = setTimeout(flush, FLUSH_DELAY_MS);
+    }
+  }
+
+  var observer = null;
+  if (window.IntersectionObserver) {
+    observer = new IntersectionObserver(
+      function (entries) {
+        entries.forEach(function (entry) {
+          if (entry.isIntersecting && entry.target.__reviewGalleryVisible) {
+            enqueue(entry.target.__reviewGalleryVisible);
+            entry.target.__reviewGalleryVisible = null;
+            observer.unobserve(entry.target);
+          }
+        });
+      },
+      { rootMargin: "300px 0px" }
+    );
+  }
+
+  function bind(el, binding) {
+    var value = binding.value;
+    var observed = !!el.__reviewGalleryVisible;
+    var uuid = observed ? el.__reviewGalleryVisible.uuid : null;
+    if (!value || !value.uuid || requested.has(value.uuid)) {
+      if (observed && observer) {
+        observer.unobserve(el);
+      }
+      el.__reviewGalleryVisible = null;
+      return;
+    }
+    el.__reviewGalleryVisible = value;
+    if (observed && uuid === value.uuid) {
+      return;
+    }
+    if (observer) {
+      // observing again reports the current intersection of the element reused for another cell
+      observer.unobserve(el);
+      observer.observe(el);
+    } else {
+      // without IntersectionObserver figures of every cell are loaded right away
+      el.__reviewGalleryVisible = null;
+      enqueue(value);
+    }
+  }
+
+  Vue.directive("review-gallery-visible", {
+    inserted: bind,
+    update: bind,
+    unbind: function (el) {
+      if (el.__reviewGalleryVisible && observer) {
+        observer.unobserve(el);
+      }
+      el.__reviewGalleryVisible = null;
+    },
+  });
+})();
@@ -0,0 +1,32 @@
+import os
+import threading
+
+import pytest
+
+# src.globals creates the API client on import, it is never used by the tests
+os.environ.setdefault("SERVER_ADDRESS", "http://localhost")
+os.environ.setdefault("API_TOKEN", "0" * 128)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """
+    Backend of the fake API without latency.
+    Every thread gets its own fake API instance, as with :func:`src.utils.get_thread_api`.
+    """
+    import src.globals as g
+    import src.utils as u
+    from benchmarks.fake_api import FakeApi, FakeBackend, Latency, SyntheticDataset
+
+    backend = FakeBackend(SyntheticDataset(3000), latency=Latency(0, 0))
+    thread_local = threading.local()
+
+    def get_thread_api():
+        api = getattr(thread_local, "api", None)
+        if api is None:
+            api = thread_local.api = FakeApi(backend)
+        return api
+
+    monkeypatch.setattr(g, "api", FakeApi(backend))
+    monkeypatch.setattr(u, "get_thread_api", get_thread_api)
+    return backend
@@ -0,0 +1,87 @@
+from typing import List
+
+import pytest
+import supervisely as sly
+
+from src.batching import BatchBudget, ImageBatches
+
+
+def make_images(first_id: int, count: int, labels_count: int = 0) -> List[sly.ImageInfo]:
+    empty = sly.ImageInfo(**dict.fromkeys(sly.ImageInfo._fields))
+    return [
+        empty._replace(id=image_id, labels_count=labels_count)
+        for image_id in range(first_id, first_id + count)
+    ]
+
+
+class Pages:
+    """Iterable over pages of images that counts the pulled pages."""
+
+    def __init__(self, sizes: List[int]):
+        self.pages = []
+        for size in sizes:
+            first_id = sum(len(page) for page in self.pages) + 1
+            self.pages.append(make_images(first_id, size))
+        self.pulled = 0
+
+    def __iter__(self):
+        for page in self.pages:
+            self.pulled += 1
+            yield page
+
+    def images(self) -> List[sly.ImageInfo]:
+        return [info for page in self.pages for info in page]
+
+
+def test_batches_are_built_only_up_to_the_requested_one():
+    pages = Pages([25, 25, 25, 25])
+    batches = ImageBatches(pages, batch_size=10)
+    assert pages.pulled == 0
+
+    assert batches.exists(0)
+    assert pages.pulled == 1
+    assert batches[1] == pages.images()[10:20]
+    assert pages.pulled == 1
+    assert batches[2] == pages.images()[20:30]
+    assert pages.pulled == 2
+    assert batches.exists(4)
+    assert pages.pulled == 2
+    assert batches[0] == pages.images()[:10]
+    assert pages.pulled == 2
+
+
+def test_final_page_shorter_than_batch_size():
+    pages = Pages([25, 25, 7])
+    batches = ImageBatches(pages, batch_size=10)
+
+    assert batches.exists(5)
+    assert not batches.exists(6)
+    assert [len(batches[idx]) for idx in range(6)] == [10, 10, 10, 10, 10, 7]
+    assert [info for idx in range(6) for info in batches[idx]] == pages.images()
+    with pytest.raises(IndexError):
+        batches[6]
+    assert len(batches) == 6
+
+
+def test_pages_smaller_than_batch_size_are_joined():
+    pages = Pages([3, 3, 3, 2])
+    batches = ImageBatches(pages, batch_size=4)
+
+    assert batches[0] == pages.images()[:4]
+    assert pages.pulled == 2
+    assert [len(batches[idx]) for idx in range(len(batches))] == [4, 4, 3]
+
+
+def test_no_pages():
+    batches = ImageBatches(Pages([]), batch_size=10)
+
+    assert not batches.exists(0)
+    assert len(batches) == 0
+
+
+def test_budget_caps_batches_by_weight():
+    images = make_images(1, 30, labels_count=10)  # weight of every image is 20
+    batches = ImageBatches.from_list(images, batch_size=10, budget=BatchBudget(budget=100))
+
+    assert [len(batches[idx]) for idx in range(len(batches))] == [5] * 6
+    assert [info for idx in range(6) for info in batches[idx]] == images
@@ -0,0 +1,137 @@
+import itertools
+import sqlite3
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import supervisely as sly
+from supervisely.api.labeling_job_api import LabelingJobInfo
+
+import src.cache
+from src.cache import ReviewCache
+from src.figure_index import FigureIndex
+
+
+def make_image(image_id: int) -> sly.ImageInfo:
+    return sly.ImageInfo(**dict.fromkeys(sly.ImageInfo._fields))._replace(
+        id=image_id,
+        name=f"image_{image_id}.jpg",
+        width=640,
+        height=480,
+        labels_count=image_id % 3,
+        tags=[{"tagId": 1, "entityId": image_id, "value": "value"}],
+        meta={"key": [1, 2]},
+    )
+
+
+def make_figures(count: int, seed: int = 0) -> FigureIndex:
+    rng = np.random.default_rng(seed)
+    return FigureIndex(
+        np.arange(count, dtype=np.int64) + 1,
+        rng.integers(1, count // 5 + 2, count),
+        rng.integers(1, 10, count),
+    )
+
+
+def assert_figures_equal(actual: FigureIndex, expected: FigureIndex):
+    for name in ("figure_ids", "figure_image_ids", "class_ids", "image_ids", "offsets"):
+        assert np.array_equal(getattr(actual, name), getattr(expected, name)), name
+
+
+def cached_entries(path) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return dict(
+            ((job_id, kind), size)
+            for job_id, kind, size in conn.execute("SELECT job_id, kind, size FROM entries")
+        )
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "review_cache.sqlite3")
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Strictly increasing access times, so the least recently used entry is always known."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(src.cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_images_and_figures_are_read_back_unchanged(path):
+    images = [make_image(image_id) for image_id in range(1, 50)]
+    figures = make_figures(1000)
+    ReviewCache(path).put_images(1, "v1", images)
+    ReviewCache(path).put_figures(1, "v1", figures)
+
+    cache = ReviewCache(path)
+    assert cache.get_images(1, "v1") == images
+    assert all(isinstance(info, sly.ImageInfo) for info in cache.get_images(1, "v1"))
+    assert_figures_equal(cache.get_figures(1, "v1"), figures)
+    assert cache.get_images(2, "v1") is None
+
+
+def test_empty_figures_are_read_back(path):
+    cache = ReviewCache(path)
+    cache.put_figures(1, "v1", FigureIndex.from_arrays([]))
+
+    assert len(cache.get_figures(1, "v1")) == 0
+
+
+def test_entry_of_other_version_is_dropped_on_read(path):
+    cache = ReviewCache(path)
+    cache.put_images(1, "v1", [make_image(1)])
+    cache.put_figures(1, "v1", make_figures(10))
+
+    assert cache.get_images(1, "v2") is None
+    assert cache.get_images(1, "v1") is None
+    assert cached_entries(path).keys() == {(1, ReviewCache.FIGURES)}
+
+
+def test_version_changes_with_job_progress():
+    job_info = LabelingJobInfo(**dict.fromkeys(LabelingJobInfo._fields))._replace(
+        status="in_progress", finished_images_count=1
+    )
+    dataset_info = sly.DatasetInfo(**dict.fromkeys(sly.DatasetInfo._fields))._replace(id=1)
+
+    version = ReviewCache.version(job_info, dataset_info)
+    assert version == ReviewCache.version(job_info, dataset_info)
+    assert version != ReviewCache.version(job_info._replace(finished_images_count=2), dataset_info)
+
+
+def test_least_recently_used_entries_are_evicted_first(path):
+    figures = make_figures(15000)  # about 0.35 MB
+    cache = ReviewCache(path, max_size_mb=1)
+    cache.put_figures(1, "v1", figures)
+    cache.put_figures(2, "v1", figures)
+    assert cache.get_figures(1, "v1") is not None
+
+    cache.put_figures(3, "v1", figures)
+
+    entries = cached_entries(path)
+    assert entries.keys() == {(1, ReviewCache.FIGURES), (3, ReviewCache.FIGURES)}
+    assert sum(entries.values()) <= 2**20
+    assert cache.get_figures(2, "v1") is None
+    assert_figures_equal(cache.get_figures(1, "v1"), figures)
+
+    cache.put_images(4, "v1", [make_image(1)])
+    cache.put_figures(5, "v1", figures)
+
+    entries = cached_entries(path)
+    assert entries.keys() == {
+        (1, ReviewCache.FIGURES),
+        (4, ReviewCache.IMAGES),
+        (5, ReviewCache.FIGURES),
+    }
+    assert sum(entries.values()) <= 2**20
+
+
+def test_entry_larger_than_the_cache_is_not_stored(path):
+    cache = ReviewCache(path, max_size_mb=1)
+    cache.put_figures(1, "v1", make_figures(10))
+    cache.put_figures(2, "v1", make_figures(50000))
+
+    assert cached_entries(path).keys() == {(1, ReviewCache.FIGURES)}
@@ -0,0 +1,193 @@
+import threading
+from collections import defaultdict
+
+import pytest
+
+from src.decision_queue import DecisionQueue
+
+
+class FakeLabelingJobApi:
+    def __init__(self, backend: "FakeBackend"):
+        self._backend = backend
+
+    def set_entity_review_status(self, job_id: int, entity_id: int, status: str):
+        self._backend.request(("review_status", job_id, entity_id), status)
+
+
+class FakeImageApi:
+    def __init__(self, backend: "FakeBackend"):
+        self._backend = backend
+
+    def update_tag_value(self, tag_id: int, value):
+        self._backend.request(("tag_value", tag_id), value)
+        return {"success": True}
+
+
+class FakeApi:
+    def __init__(self, backend: "FakeBackend"):
+        self.labeling_job = FakeLabelingJobApi(backend)
+        self.image = FakeImageApi(backend)
+
+
+class FakeBackend:
+    """Records applied values and the number of requests by key, can fail or block requests."""
+
+    def __init__(self):
+        self.applied = {}
+        self.requests = defaultdict(int)
+        self.failing = set()
+        self.blocked = {}  # key -> event the request waits for
+        self._lock = threading.Lock()
+
+    def request(self, key, value):
+        with self._lock:
+            self.requests[key] += 1
+        if key in self.blocked:
+            self.blocked[key].wait(10)
+        if key in self.failing:
+            raise RuntimeError(f"{key} failed")
+        with self._lock:
+            self.applied[key] = value
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def make_queue(tmp_path, backend):
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault("retries", 1)
+        queue = DecisionQueue(
+            str(tmp_path / "queue" / "decisions.db"), lambda: FakeApi(backend), **kwargs
+        )
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(timeout=5)
+
+
+def test_put_journals_decisions_without_sending(make_queue, backend):
+    queue = make_queue()
+    queue.put(1, {10: "accepted", 11: "rejected"}, {100: "value"})
+
+    assert queue.counts() == (3, 0)
+    assert make_queue().counts() == (3, 0)
+    assert backend.requests == {}
+
+
+def test_start_replays_journaled_decisions(make_queue, backend):
+    make_queue().put(1, {10: "accepted", 11: "rejected"}, {100: "value"})
+
+    queue = make_queue()
+    queue.start()
+
+    assert queue.join(timeout=5)
+    assert queue.counts() == (0, 0)
+    assert backend.applied == {
+        ("review_status", 1, 10): "accepted",
+        ("review_status", 1, 11): "rejected",
+        ("tag_value", 100): "value",
+    }
+
+
+def test_newer_decision_replaces_pending_one(make_queue, backend):
+    queue = make_queue()
+    queue.put(1, {10: "accepted"}, {100: "old"})
+    queue.put(1, {10: "rejected"}, {100: "new"})
+    queue.put(2, {10: "accepted"}, {})
+
+    assert queue.counts() == (3, 0)
+    queue.start()
+    assert queue.join(timeout=5)
+    assert backend.applied == {
+        ("review_status", 1, 10): "rejected",
+        ("review_status", 2, 10): "accepted",
+        ("tag_value", 100): "new",
+    }
+    assert all(count == 1 for count in backend.requests.values())
+
+
+def test_newer_decision_is_sent_after_the_one_in_flight(make_queue, backend):
+    key = ("review_status", 1, 10)
+    backend.blocked[key] = threading.Event()
+    queue = make_queue()
+    queue.put(1, {10: "accepted"}, {})
+    queue.start()
+    while backend.requests[key] == 0:
+        threading.Event().wait(0.01)
+
+    queue.put(1, {10: "rejected"}, {})
+    backend.blocked.pop(key).set()
+
+    assert queue.join(timeout=5)
+    assert backend.requests[key] == 2
+    assert backend.applied[key] == "rejected"
+
+
+def test_decision_fails_after_max_attempts(make_queue, backend):
+    backend.failing.add(("review_status", 1, 11))
+    queue = make_queue(max_attempts=2)
+    queue.put(1, {10: "accepted", 11: "rejected"}, {})
+    queue.start()
+
+    assert queue.join(timeout=10)
+    assert queue.counts() == (0, 1)
+    assert backend.requests[("review_status", 1, 11)] == 2
+    assert backend.applied == {("review_status", 1, 10): "accepted"}
+
+
+def test_retry_failed_sends_failed_decisions_again(make_queue, backend):
+    backend.failing.add(("review_status", 1, 11))
+    queue = make_queue(max_attempts=1)
+    queue.put(1, {11: "rejected"}, {})
+    queue.start()
+    assert queue.join(timeout=5)
+    assert queue.counts() == (0, 1)
+
+    backend.failing.clear()
+    queue.retry_failed(job_id=2)
+    assert queue.counts() == (0, 1)
+    queue.retry_failed(job_id=1)
+
+    assert queue.join(timeout=5)
+    assert queue.counts() == (0, 0)
+    assert backend.applied == {("review_status", 1, 11): "rejected"}
+
+
+def test_discard_failed_removes_only_job_decisions(make_queue, backend):
+    backend.failing.update({("review_status", 1, 11), ("review_status", 2, 11)})
+    queue = make_queue(max_attempts=1)
+    queue.put(1, {11: "rejected"}, {})
+    queue.put(2, {11: "rejected"}, {})
+    queue.start()
+    assert queue.join(timeout=5)
+    assert queue.counts() == (0, 2)
+
+    assert queue.discard_failed(job_id=1) == 1
+    assert queue.counts(1) == (0, 0)
+    assert queue.counts(2) == (0, 1)
+    assert queue.discard_failed() == 1
+    assert queue.counts() == (0, 0)
+
+
+def test_join_waits_only_for_the_job(make_queue, backend):
+    key = ("review_status", 2, 20)
+    backend.blocked[key] = threading.Event()
+    queue = make_queue(chunk_size=1)
+    queue.put(1, {10: "accepted"}, {})
+    queue.put(2, {20: "accepted"}, {})
+    queue.start()
+
+    assert queue.join(job_id=1, timeout=5)
+    assert not queue.join(job_id=2, timeout=0.2)
+    assert not queue.join(timeout=0.1)
+
+    backend.blocked[key].set()
+    assert queue.join(job_id=2, timeout=5)
+    assert backend.applied == {("review_status", 1, 10): "accepted", key: "accepted"}
@@ -0,0 +1,124 @@
+import random
+from collections import namedtuple
+from typing import Dict, List
+
+import numpy as np
+import pytest
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+from src.filtering import ImageFilter
+
+Figure = namedtuple("Figure", ["id", "class_id"])
+
+TAG_IDS = [201, 202, 203, 204, 205]
+CLASS_IDS = [101, 102, 103, 104, 105, 106]
+
+
+def reference_filter_by_tags(images: List[sly.ImageInfo], tag_ids: List[int]):
+    """Per-image tag filtering the sparse one replaced."""
+    filtered_images = []
+    for img in images:
+        if len(img.tags) == 0 and len(tag_ids) == 0:
+            filtered_images.append(img)
+            continue
+        img_tag_ids = [tag["tagId"] for tag in img.tags]
+        if any(tag_id in tag_ids for tag_id in img_tag_ids):
+            filtered_images.append(img)
+    return filtered_images
+
+
+def reference_filter_by_classes(
+    images: List[sly.ImageInfo], figures: Dict[int, List[Figure]], class_ids: List[int]
+):
+    """Per-image class filtering the figures index lookup replaced."""
+    filtered_img_ids = []
+    for img in images:
+        img_figures = figures.get(img.id, [])
+        if len(class_ids) == 0 and len(img_figures) == 0:
+            filtered_img_ids.append(img.id)
+        elif len(class_ids) > 0 and len(img_figures) > 0:
+            if any(figure.class_id in class_ids for figure in img_figures):
+                filtered_img_ids.append(img.id)
+    filtered_img_ids = set(filtered_img_ids)
+    return [img for img in images if img.id in filtered_img_ids]
+
+
+def make_image(image_id: int, tag_ids: List[int]) -> sly.ImageInfo:
+    return sly.ImageInfo(**dict.fromkeys(sly.ImageInfo._fields))._replace(
+        id=image_id,
+        tags=[{"tagId": tag_id, "entityId": image_id, "value": None} for tag_id in tag_ids],
+    )
+
+
+def generate(seed: int, images_count: int):
+    rng = random.Random(seed)
+    images, figures = [], {}
+    image_ids = rng.sample(range(1, images_count * 10), images_count)
+    for image_id in image_ids:
+        tags_count = rng.choice([0, 0, 1, 2, len(TAG_IDS)])
+        images.append(make_image(image_id, rng.sample(TAG_IDS, tags_count)))
+        figures_count = rng.choice([0, 0, 1, 3, 10])
+        if figures_count > 0:
+            figures[image_id] = [
+                Figure(image_id * 100 + idx, rng.choice(CLASS_IDS)) for idx in range(figures_count)
+            ]
+    # figures of images that are not filtered, e.g. of other jobs
+    figures[images_count * 10 + 1] = [Figure(1, CLASS_IDS[0])]
+    return images, figures
+
+
+def to_index(figures: Dict[int, List[Figure]]) -> FigureIndex:
+    data = np.array(
+        [(f.id, image_id, f.class_id) for image_id, figs in figures.items() for f in figs],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    return FigureIndex.from_arrays([data])
+
+
+def random_selections(seed: int, ids: List[int], count: int = 10) -> List[List[int]]:
+    rng = random.Random(seed)
+    selections = [[], list(ids), [ids[0]], [999]]
+    selections += [rng.sample(ids, rng.randint(1, len(ids))) for _ in range(count)]
+    return selections
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tag_filter_matches_the_per_image_filter(seed):
+    images, _ = generate(seed, 300)
+    image_filter = ImageFilter(images)
+
+    for tag_ids in random_selections(seed, TAG_IDS):
+        expected = reference_filter_by_tags(images, tag_ids)
+        assert image_filter.select(image_filter.has_tags(tag_ids)) == expected, tag_ids
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_class_filter_matches_the_per_image_filter(seed):
+    images, figures = generate(seed, 300)
+    image_filter = ImageFilter(images, to_index(figures))
+
+    for class_ids in random_selections(seed, CLASS_IDS):
+        expected = reference_filter_by_classes(images, figures, class_ids)
+        assert image_filter.select(image_filter.has_classes(class_ids)) == expected, class_ids
+
+
+def test_empty_selection_matches_images_lacking_the_elements():
+    images = [make_image(1, []), make_image(2, [201]), make_image(3, []), make_image(4, [202])]
+    figures = {2: [Figure(1, 101)], 3: [Figure(2, 102)]}
+    image_filter = ImageFilter(images, to_index(figures))
+
+    assert [img.id for img in image_filter.select(image_filter.has_tags([]))] == [1, 3]
+    assert [img.id for img in image_filter.select(image_filter.has_classes([]))] == [1, 4]
+
+
+def test_filters_of_no_images():
+    image_filter = ImageFilter([], to_index({}))
+
+    assert image_filter.select(image_filter.has_tags([])) == []
+    assert image_filter.select(image_filter.has_classes([101])) == []
+
+
+def test_class_filter_requires_figures():
+    with pytest.raises(ValueError):
+        ImageFilter([make_image(1, [])]).has_classes([101])
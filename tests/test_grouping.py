@@ -0,0 +1,96 @@
+import random
+from collections import namedtuple
+from typing import Dict, List
+
+import numpy as np
+import pytest
+import supervisely as sly
+
+from src.figure_index import FigureIndex
+from src.grouping import group_images
+
+Figure = namedtuple("Figure", ["class_id"])
+
+
+def reference_group_images(
+    images: List[sly.ImageInfo],
+    figures: Dict[int, List[Figure]],
+    group_by: str,
+    project_meta: sly.ProjectMeta,
+) -> List[sly.ImageInfo]:
+    """Sequential grouping the bucketed one replaced, used as the reference of the order."""
+    images = list(images)
+    grouped_images = []
+    if group_by == "class":
+        cond_func = lambda img, fig, cls: any(f.class_id == cls.sly_id for f in fig)
+        items = project_meta.obj_classes
+    elif group_by == "tag":
+        cond_func = lambda img, fig, tag: tag.sly_id in [tag["tagId"] for tag in img.tags]
+        items = project_meta.tag_metas
+    else:
+        raise NotImplementedError(f"Invalid group_by value: {group_by}")
+
+    for item in items:
+        for idx in range(len(images) - 1, -1, -1):
+            img = images[idx]
+            fig = figures.get(img.id, [])
+            if cond_func(img, fig, item):
+                grouped_images.append(img)
+                images.pop(idx)
+
+    grouped_images.extend(images)
+    return grouped_images
+
+
+def _random_case(rng: random.Random):
+    classes_count = rng.randint(0, 6)
+    tags_count = rng.randint(0, 6)
+    project_meta = sly.ProjectMeta(
+        obj_classes=[
+            sly.ObjClass(f"class_{idx}", sly.Rectangle, sly_id=100 + idx)
+            for idx in range(classes_count)
+        ],
+        tag_metas=[
+            sly.TagMeta(f"tag_{idx}", sly.TagValueType.NONE, sly_id=200 + idx)
+            for idx in range(tags_count)
+        ],
+    )
+    # some figures and tags reference classes and tags that are not in the project meta
+    class_ids = [100 + idx for idx in range(classes_count + 2)]
+    tag_ids = [200 + idx for idx in range(tags_count + 2)]
+
+    images, figures = [], {}
+    image_ids = rng.sample(range(1, 10_000), rng.randint(0, 60))
+    for image_id in image_ids:
+        tags = [
+            {"id": image_id * 10 + idx, "tagId": tag_id}
+            for idx, tag_id in enumerate(rng.sample(tag_ids, rng.randint(0, len(tag_ids))))
+        ]
+        images.append(
+            sly.ImageInfo(**dict.fromkeys(sly.ImageInfo._fields))._replace(id=image_id, tags=tags)
+        )
+        image_figures = [Figure(rng.choice(class_ids)) for _ in range(rng.randint(0, 4))]
+        if image_figures:
+            figures[image_id] = image_figures
+    # figures of images that are not reviewed, e.g. filtered out by tags
+    figures[10_000] = [Figure(class_ids[0])]
+
+    rows = [(image_id, f.class_id) for image_id, fig in figures.items() for f in fig]
+    rows = [(figure_id, *row) for figure_id, row in enumerate(rows)]
+    rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    index = FigureIndex(rows[:, 0], rows[:, 1], rows[:, 2])
+    return images, figures, index, project_meta
+
+
+@pytest.mark.parametrize("group_by", ["class", "tag"])
+@pytest.mark.parametrize("seed", range(50))
+def test_group_images_matches_sequential_grouping(group_by, seed):
+    images, figures, index, project_meta = _random_case(random.Random(seed))
+    expected = reference_group_images(images, figures, group_by, project_meta)
+    grouped = group_images(images, index, group_by, project_meta)
+    assert [img.id for img in grouped] == [img.id for img in expected]
+
+
+def test_group_images_keeps_order_without_grouping():
+    images, _, index, project_meta = _random_case(random.Random(0))
+    assert group_images(images, index, "none", project_meta) == images
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+import supervisely as sly
+from supervisely.app import DataJson
+from supervisely.app.content import StateJson
+
+from src.ui.review_gallery.widget import ReviewGallery
+
+SIZES = [100, 200, 400]
+REPEATS = 3
+
+
+@pytest.fixture(autouse=True)
+def no_sync(monkeypatch):
+    # changes are sent to the connected clients, there are none in tests
+    monkeypatch.setattr(DataJson, "send_changes", lambda self: None)
+    monkeypatch.setattr(StateJson, "send_changes", lambda self: None)
+
+
+@pytest.fixture
+def project_meta():
+    return sly.ProjectMeta(
+        obj_classes=[sly.ObjClass("box", sly.Rectangle, sly_id=1)],
+        tag_metas=[sly.TagMeta("status", sly.TagValueType.ANY_STRING, sly_id=2)],
+    )
+
+
+def _batch(project_meta: sly.ProjectMeta, size: int, first_id: int):
+    obj_class = project_meta.get_obj_class("box")
+    tag_meta = project_meta.get_tag_meta("status")
+    image_infos, annotations = [], []
+    for image_id in range(first_id, first_id + size):
+        image_infos.append(
+            sly.ImageInfo(**dict.fromkeys(sly.ImageInfo._fields))._replace(
+                id=image_id,
+                name=f"{image_id}.jpg",
+                width=640,
+                height=480,
+                full_storage_url=f"https://example.com/{image_id}.jpg",
+                tags=[{"id": image_id, "tagId": tag_meta.sly_id, "value": "todo"}],
+            )
+        )
+        labels = [
+            sly.Label(sly.Rectangle(10 * i, 10 * i, 10 * i + 50, 10 * i + 50), obj_class)
+            for i in range(5)
+        ]
+        annotations.append(sly.Annotation((480, 640), labels=labels))
+    return image_infos, annotations
+
+
+def _extend_time(project_meta: sly.ProjectMeta, batches: int, size: int) -> float:
+    """Returns the time of the last of ``batches`` extensions of the gallery by ``size`` images."""
+    gallery = ReviewGallery(columns_number=4, empty_message="")
+    duration = None
+    for batch_idx in range(batches):
+        image_infos, annotations = _batch(project_meta, size, batch_idx * size + 1)
+        start = time.perf_counter()
+        gallery.extend(image_infos, annotations, project_meta)
+        duration = time.perf_counter() - start
+    return duration
+
+
+def test_extend_grows_linearly(project_meta):
+    per_image = [
+        min(_extend_time(project_meta, 1, size) for _ in range(REPEATS)) / size for size in SIZES
+    ]
+    # quadratic growth would take 4 times longer per image on the largest batch
+    assert per_image[-1] < per_image[0] * 2.5, per_image
+
+
+def test_extend_does_not_rebuild_shown_cells(project_meta, monkeypatch):
+    built = []
+    build_cell = ReviewGallery._build_cell
+
+    def _build_cell(self, cell_data):
+        built.append(cell_data["cell_uuid"])
+        return build_cell(self, cell_data)
+
+    monkeypatch.setattr(ReviewGallery, "_build_cell", _build_cell)
+    gallery = ReviewGallery(columns_number=4, empty_message="")
+    for batch_idx in range(4):
+        image_infos, annotations = _batch(project_meta, SIZES[0], batch_idx * SIZES[0] + 1)
+        cell_uuids = gallery.extend(image_infos, annotations, project_meta)
+        assert built == cell_uuids
+        built.clear()
+
+
+def test_image_click_shows_full_geometry(project_meta, monkeypatch):
+    built = []
+    build_cell = ReviewGallery._build_cell
+
+    def _build_cell(self, cell_data):
+        built.append(cell_data["cell_uuid"])
+        return build_cell(self, cell_data)
+
+    monkeypatch.setattr(ReviewGallery, "_build_cell", _build_cell)
+    gallery = ReviewGallery(columns_number=4, empty_message="")
+    image_infos, annotations = _batch(project_meta, 3, 1)
+    cell_uuids = gallery.extend(image_infos, annotations, project_meta)
+    built.clear()
+    route_path = gallery.get_route_path(ReviewGallery.Routes.IMAGE_CLICKED)
+    (route,) = [r for r in gallery._sly_app.get_server().routes if r.path == route_path]
+
+    StateJson()[gallery.widget_id]["selectedImage"] = {"uuid": cell_uuids[1]}
+    route.endpoint()
+    route.endpoint()
+
+    assert built == [cell_uuids[1]]
+    assert DataJson()[gallery.widget_id]["widget_routes"] == {
+        ReviewGallery.Routes.IMAGE_CLICKED: "show_full_geometry"
+    }
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from src.utils import list_filtered_images_pages, list_light_figures_info
+
+
+def job_filters(dataset) -> list:
+    return [{"type": "job", "data": {"jobId": dataset.JOB_ID, "status": ["done", "none"]}}]
+
+
+def expected_figures(dataset, image_ids=None, class_ids=None):
+    """Returns sorted IDs of the dataset figures on the images and of the classes."""
+    figure_idx = np.arange(dataset.figures_count)
+    figure_image_ids = dataset.image_ids[dataset.figure_image_idx]
+    figure_class_ids = dataset.figure_class_idx + dataset.CLASS_ID_OFFSET
+    mask = np.ones(dataset.figures_count, dtype=bool)
+    if image_ids is not None:
+        mask &= np.isin(figure_image_ids, image_ids)
+    if class_ids is not None:
+        mask &= np.isin(figure_class_ids, class_ids)
+    return np.sort(dataset.figure_ids(figure_idx[mask]))
+
+
+@pytest.mark.parametrize("class_ids", [None, [100, 103, 107]])
+def test_figures_of_image_chunks_are_exactly_figures_of_the_images(fake_backend, class_ids):
+    fake_backend.figures_page_size = 50
+    dataset = fake_backend.dataset
+    rng = np.random.default_rng(0)
+    image_ids = rng.choice(dataset.image_ids, 700, replace=False).tolist()
+    image_ids += image_ids[:10]  # duplicates are requested once
+
+    index = list_light_figures_info(
+        dataset.DATASET_ID,
+        job_id=dataset.JOB_ID,
+        class_ids=class_ids,
+        image_ids=image_ids,
+        image_ids_chunk_size=128,
+    )
+
+    assert fake_backend.calls["figures.list"] > 700 // 128 + 1
+    assert np.array_equal(
+        np.sort(index.figure_ids), expected_figures(dataset, image_ids, class_ids)
+    )
+    assert set(index.image_ids.tolist()) <= set(image_ids)
+    figure_image_ids = dataset.image_ids[dataset.figure_image_idx[index.figure_ids - 1]]
+    assert np.array_equal(index.figure_image_ids, figure_image_ids)
+
+
+def test_figures_of_no_images_are_not_requested(fake_backend):
+    index = list_light_figures_info(fake_backend.dataset.DATASET_ID, image_ids=[])
+
+    assert len(index) == 0
+    assert fake_backend.calls["figures.list"] == 0
+
+
+def test_figures_of_the_dataset_are_fetched_by_pages(fake_backend):
+    fake_backend.figures_page_size = 1000
+    dataset = fake_backend.dataset
+
+    index = list_light_figures_info(dataset.DATASET_ID)
+
+    assert fake_backend.calls["figures.list"] == -(-dataset.figures_count // 1000)
+    assert np.array_equal(np.sort(index.figure_ids), expected_figures(dataset))
+
+
+def test_images_reviewed_while_paging_are_not_skipped(fake_backend):
+    dataset = fake_backend.dataset
+
+    total, pages = list_filtered_images_pages(
+        dataset.DATASET_ID, job_filters(dataset), per_page=400
+    )
+    listed = []
+    for page in pages:
+        listed.extend(info.id for info in page)
+        # reviewed images drop out of the job filter and shift the offsets of the next pages
+        fake_backend.review_statuses.update({info.id: "accepted" for info in page})
+
+    assert total == dataset.images_count
+    assert listed == dataset.image_ids.tolist()
+    assert fake_backend.calls["images.list"] == -(-dataset.images_count // 400)
+
+
+def test_final_page_shorter_than_per_page(fake_backend):
+    dataset = fake_backend.dataset
+    fake_backend.review_statuses.update(
+        {int(image_id): "accepted" for image_id in dataset.image_ids[:500]}
+    )
+
+    total, pages = list_filtered_images_pages(
+        dataset.DATASET_ID, job_filters(dataset), per_page=1000
+    )
+
+    assert total == 2500
+    assert fake_backend.calls["images.list"] == 1
+    pages = list(pages)
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    assert [info.id for page in pages for info in page] == dataset.image_ids[500:].tolist()
+    assert fake_backend.calls["images.list"] == 3
+
+
+def test_no_images_to_page(fake_backend):
+    dataset = fake_backend.dataset
+    fake_backend.review_statuses.update(
+        {int(image_id): "accepted" for image_id in dataset.image_ids}
+    )
+
+    total, pages = list_filtered_images_pages(dataset.DATASET_ID, job_filters(dataset))
+
+    assert total == 0
+    assert list(pages) == []